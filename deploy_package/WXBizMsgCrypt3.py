@@ -17,6 +17,13 @@ import xml.etree.cElementTree as ET
 
 from Crypto.Cipher import AES
 
+# 解密时优先使用cryptography（OpenSSL后端，自动使用AES-NI等硬件指令）
+try:
+    from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+    CRYPTOGRAPHY_AVAILABLE = True
+except ImportError:
+    CRYPTOGRAPHY_AVAILABLE = False
+
 # Description:定义错误码含义
 #########################################################################
 WXBizMsgCrypt_OK = 0
@@ -188,9 +195,13 @@ class Prpcrypt(object):
         @return: 删除填充补位后的明文
         """
         try:
-            cryptor = AES.new(self.key, self.mode, self.key[:16])
             # 使用BASE64对密文进行解码，然后AES-CBC解密
-            plain_text = cryptor.decrypt(base64.b64decode(text))
+            if CRYPTOGRAPHY_AVAILABLE:
+                decryptor = Cipher(algorithms.AES(self.key), modes.CBC(self.key[:16])).decryptor()
+                plain_text = decryptor.update(base64.b64decode(text)) + decryptor.finalize()
+            else:
+                cryptor = AES.new(self.key, self.mode, self.key[:16])
+                plain_text = cryptor.decrypt(base64.b64decode(text))
         except Exception as e:
             logger = logging.getLogger()
             logger.error(e)
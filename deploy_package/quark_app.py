@@ -7,18 +7,30 @@ import json
 import os
 import re
 import hashlib
+import heapq
+import hmac
+import io
+import logging
 import base64
+import functools
 import struct
 import socket
+import sys
+import threading
 import time
-from http.server import HTTPServer, BaseHTTPRequestHandler
+import traceback
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import chain, islice
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 from urllib.parse import urlparse, parse_qs, unquote
-from typing import Optional
+from email.utils import formatdate
+from typing import NamedTuple, Optional
 import xml.etree.ElementTree as ET
 
 from quark_manager import QuarkPanFileManager, CONFIG_DIR
 from wechat_app import WeChatApp
-from utils import custom_print, get_datetime, read_config, save_config
+from utils import custom_print, get_datetime, read_config
 
 # 尝试导入WXBizMsgCrypt用于消息加解密
 try:
@@ -36,18 +48,197 @@ except ImportError:
     HTTPX_AVAILABLE = False
     custom_print("警告: httpx未安装，微信消息转发功能将不可用。请运行: pip install httpx", error_msg=True)
 
-# 尝试导入AES解密所需的库
+# 尝试导入uvloop作为后台事件循环实现（libuv实现，调度和socket开销更低；Windows不支持，未安装时使用标准库事件循环）
+try:
+    import uvloop
+    UVLOOP_AVAILABLE = True
+except ImportError:
+    UVLOOP_AVAILABLE = False
+
+# 尝试导入lxml用于解析回调XML（C实现的解析器，比标准库ElementTree更快；未安装时回退到标准库）
+try:
+    from lxml import etree as lxml_etree
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
+
+# 尝试导入xxhash用于消息去重键（可选，未安装时回退到内置hash）
+try:
+    import xxhash
+    XXHASH_AVAILABLE = True
+except ImportError:
+    XXHASH_AVAILABLE = False
+
+# 尝试导入orjson用于JSON响应序列化（可选，未安装时回退到标准库json）
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# 尝试导入pyahocorasick用于屏蔽词多模式匹配（可选，未安装时回退到逐个关键词匹配）
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+# 尝试导入AES解密所需的库（优先使用cryptography，其底层OpenSSL会自动使用AES-NI等硬件指令；pycryptodome作为回退）
+try:
+    from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+    CRYPTOGRAPHY_AVAILABLE = True
+except ImportError:
+    CRYPTOGRAPHY_AVAILABLE = False
+
 try:
     from Crypto.Cipher import AES
-    AES_AVAILABLE = True
+    PYCRYPTODOME_AVAILABLE = True
 except ImportError:
-    AES_AVAILABLE = False
-    custom_print("警告: pycryptodome未安装，无法使用EncodingAESKey解密功能。请运行: pip install pycryptodome", error_msg=True)
+    PYCRYPTODOME_AVAILABLE = False
+
+AES_AVAILABLE = CRYPTOGRAPHY_AVAILABLE or PYCRYPTODOME_AVAILABLE
+if not AES_AVAILABLE:
+    custom_print("警告: cryptography和pycryptodome均未安装，无法使用EncodingAESKey解密功能。请运行: pip install cryptography", error_msg=True)
+
+# 调试模式（设置环境变量 QKBOT_DEBUG=1 开启详细日志）
+_DEBUG = os.environ.get('QKBOT_DEBUG') == '1'
+
+# 夸克网盘分享链接及提取码匹配（模块级预编译）
+_QUARK_URL_RE = re.compile(r'https?://pan\.quark\.cn/s/[^\s)]+')
+_PWD_RE = re.compile(r'pwd=([^&#]*)')
+
+# 屏蔽词输入分隔（中英文逗号，连同两侧空白一起切分）
+_BAN_SPLIT_RE = re.compile(r'\s*[,，]+\s*')
+
+# 消息命令集合（小写），用于O(1)成员判断
+_VERIFY_CMDS = frozenset({'verify', '验证', '检查cookie'})
+_HELP_CMDS = frozenset({'/help', 'help', '/帮助', '帮助'})
+_PAGE_NEXT_CMDS = frozenset({'n', 'next', '下一页'})
+_PAGE_PREV_CMDS = frozenset({'p', 'prev', 'previous', '上一页'})
+
+# 文件大小单位（从大到小）
+_SIZE_UNITS = ((1 << 30, 'GB'), (1 << 20, 'MB'), (1 << 10, 'KB'))
+# 搜索结果类型对应的图标
+_TYPE_ICONS = {'文件夹': "📁", '文件': "📄"}
+
+
+def _fmt_size(size: int) -> str:
+    """格式化文件大小"""
+    for threshold, unit in _SIZE_UNITS:
+        if size >= threshold:
+            return f"{size / threshold:.2f} {unit}"
+    return f"{size} B"
+
+
+class SearchItem(NamedTuple):
+    """搜索结果项（比dict更省内存，字段用属性访问）"""
+    fid: str
+    name: str
+    type: str  # '文件' 或 '文件夹'
+    size: int  # 文件夹为0
+    path: str
+
+
+def _is_dir(item: dict) -> bool:
+    """判断文件列表项是否为文件夹"""
+    return bool(item.get('dir')) or item.get('file_type') == 0
+
+
+def _make_folder(item: dict, path: str) -> SearchItem:
+    """由文件列表项构建文件夹搜索结果"""
+    return SearchItem(item['fid'], item.get('file_name', ''), '文件夹', 0, path)
+
+
+def _make_file(item: dict, path: str) -> SearchItem:
+    """由文件列表项构建文件搜索结果"""
+    return SearchItem(item['fid'], item.get('file_name', ''), '文件', item.get('size', 0) or 0, path)
+
+
+def _search_item_article(idx: int, item: SearchItem) -> dict:
+    """构建搜索结果项的卡片（标题：序号 + 类型 + 名称，描述：类型、路径和大小）"""
+    description = f"类型：{item.type}"
+    if item.path:
+        description += f"\n路径：{item.path}"
+    if item.size:
+        description += f"\n大小：{_fmt_size(item.size)}"
+    return {
+        "title": f"{idx}. [{item.type}] {item.name}",
+        "description": description,
+        "picurl": "",
+        "url": ""
+    }
+
+
+def _search_item_at(search_result: dict, idx: int) -> Optional[SearchItem]:
+    """按序号（从0开始，文件在前、文件夹在后）取搜索结果项，不拼接列表"""
+    files = search_result.get('files', [])
+    if idx < len(files):
+        return files[idx]
+    idx -= len(files)
+    folders = search_result.get('folders', [])
+    return folders[idx] if 0 <= idx < len(folders) else None
+
+
+def _search_page(search_result: dict, start: int, end: int) -> list:
+    """
+    取搜索结果中[start, end)区间的项（文件在前、文件夹在后）
+    
+    直接按下标定位到两个分桶中的位置，只拷贝当前页的几项，翻到靠后的页也无需从头迭代
+    """
+    files = search_result.get('files', [])
+    folders = search_result.get('folders', [])
+    n_files = len(files)
+    page = files[start:end] if start < n_files else []
+    if end > n_files:
+        page.extend(folders[max(start - n_files, 0):end - n_files])
+    return page
+
+
+def _json_bytes(data) -> bytes:
+    """序列化为UTF-8编码的JSON字节串（不转义非ASCII字符）"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+
+def _message_key(from_user: str, content: str) -> int:
+    """计算消息去重键（64位整数；仅用于进程内去重，不要求抗碰撞）"""
+    if XXHASH_AVAILABLE:
+        # 分段喂给哈希器，不拼接中间字符串
+        hasher = xxhash.xxh3_64(from_user.encode('utf-8'))
+        hasher.update(b':')
+        hasher.update(content.encode('utf-8'))
+        return hasher.intdigest()
+    return hash((from_user, content)) & 0xFFFFFFFFFFFFFFFF
+
+
+logger = logging.getLogger(__name__)
+
+
+def _log_exc() -> None:
+    """
+    输出当前正在处理的异常堆栈
+    
+    先检查日志输出端：本模块的logger关闭了ERROR级别时直接跳过，不遍历栈帧格式化堆栈；
+    配置了logging处理器时交给logger.exception（由处理器负责格式化）；否则照旧用custom_print输出到控制台
+    """
+    if not logger.isEnabledFor(logging.ERROR):
+        return
+    if logger.hasHandlers():
+        logger.exception("处理异常")
+    else:
+        custom_print(traceback.format_exc(), error_msg=True)
 
 
 class QuarkAppHandler:
     """夸克网盘应用处理器（基于企业微信应用）"""
     
+    # 搜索时可接受的文件列表缓存时间（秒，缓存位于文件管理器中，网盘内容变化时自动清除）
+    SEARCH_LIST_MAX_AGE = 60.0
+    # 单次递归搜索同时请求文件列表的最大数量
+    SEARCH_CONCURRENCY = 8
+    SEARCH_PAGE_SIZE = 7  # 每页显示的搜索结果数（加上标题和翻页提示，总共最多8个article）
+    
     def __init__(self, corp_id: str, agent_id: str, secret: str, 
                  default_folder_id: str = '0', search_folder_id: str = '0',
                  proxy: Optional[str] = None,
@@ -70,7 +261,8 @@ class QuarkAppHandler:
         self.secret = secret
         self.default_folder_id = default_folder_id
         self.search_folder_id = search_folder_id
-        self.app = WeChatApp(corp_id, agent_id, secret, proxy=proxy)
+        self.app = WeChatApp(corp_id, agent_id, secret, proxy=proxy,
+                             token_cache_path=os.path.join(CONFIG_DIR, 'wechat_token.json'))
         self.manager: Optional[QuarkPanFileManager] = None
         self.user_search_results: dict[str, dict] = {}  # 按用户ID存储搜索结果
         self.user_search_mode: dict[str, bool] = {}  # 按用户ID存储搜索模式状态
@@ -79,24 +271,82 @@ class QuarkAppHandler:
         self.ad_fid = ad_fid.strip()
         # 记录等待用户输入屏蔽词的状态
         self.user_waiting_ban_input: dict[str, bool] = {}
+        self._ban_ac = None  # 屏蔽词Aho-Corasick自动机
+        self._build_ban_automaton()
+        # bot_config.json的内存副本，更新屏蔽词时无需重新读取解析
+        self._config_path = os.path.join(CONFIG_DIR, 'bot_config.json')
+        # 配置写盘使用单线程执行器：多次更新按提交顺序依次写入，不会并发写同一个文件
+        self._config_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='bot-config')
+        self._bot_config_cache: Optional[dict] = self._read_bot_config()
         self._load_manager()
 
+    def _read_bot_config(self) -> Optional[dict]:
+        """读取bot_config.json，失败返回None"""
+        try:
+            return read_config(self._config_path, 'json')
+        except Exception as e:
+            custom_print(f"读取配置文件失败: {str(e)}", error_msg=True)
+            return None
+
+    def _persist_bot_config(self, content: str) -> None:
+        """将配置内容写入bot_config.json（先写临时文件再os.replace，写入中途出错也不会损坏原文件）"""
+        tmp_path = f"{self._config_path}.tmp"
+        try:
+            # 配置中包含应用密钥：沿用原文件的权限，原文件不存在时只允许当前用户读写
+            try:
+                file_mode = os.stat(self._config_path).st_mode & 0o777
+            except OSError:
+                file_mode = 0o600
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, file_mode)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(content)
+            os.chmod(tmp_path, file_mode)
+            os.replace(tmp_path, self._config_path)
+        except Exception as e:
+            custom_print(f"保存屏蔽词到配置失败: {str(e)}", error_msg=True)
+
+    def _build_ban_automaton(self) -> None:
+        """根据当前屏蔽词构建Aho-Corasick自动机（库不可用或无屏蔽词时为None）"""
+        if not AHOCORASICK_AVAILABLE or not self.banned_keywords:
+            self._ban_ac = None
+            return
+        automaton = ahocorasick.Automaton()
+        for k in self.banned_keywords:
+            automaton.add_word(k, k)
+        automaton.make_automaton()
+        self._ban_ac = automaton
+
+    def _hit_banned(self, name: str) -> bool:
+        """判断文件名是否包含任一屏蔽词"""
+        if self._ban_ac is not None:
+            try:
+                next(self._ban_ac.iter(name))
+                return True
+            except StopIteration:
+                return False
+        return any(k in name for k in self.banned_keywords)
+
     def _update_banned_keywords(self, new_keywords: list[str]) -> None:
         """更新内存与配置文件的屏蔽词"""
-        merged = set(self.banned_keywords)
-        for k in new_keywords:
-            k = k.strip()
-            if k:
-                merged.add(k)
-        self.banned_keywords = [k for k in merged if k]
+        # 按原有顺序去重合并，保证写回配置的屏蔽词顺序稳定
+        self.banned_keywords = list(dict.fromkeys(
+            filter(None, (k.strip() for k in (self.banned_keywords + list(new_keywords))))
+        ))
+        self._build_ban_automaton()
         if self.manager:
             self.manager.banned_keywords = self.banned_keywords
-        # 写回配置文件
+        # 写回配置文件（更新内存副本，交由单线程执行器按顺序写盘；不在事件循环中时等待写入完成）
         try:
-            config_path = os.path.join(CONFIG_DIR, 'bot_config.json')
-            cfg = read_config(config_path, 'json')
+            if self._bot_config_cache is None:
+                self._bot_config_cache = read_config(self._config_path, 'json')
+            cfg = self._bot_config_cache
             cfg['quark_banned'] = ",".join(self.banned_keywords)
-            save_config(config_path, json.dumps(cfg, ensure_ascii=False, indent=2))
+            content = json.dumps(cfg, ensure_ascii=False, indent=2)
+            future = self._config_writer.submit(self._persist_bot_config, content)
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                future.result()
             custom_print(f"屏蔽词已更新并保存：{cfg['quark_banned']}")
         except Exception as e:
             custom_print(f"保存屏蔽词到配置失败: {str(e)}", error_msg=True)
@@ -134,18 +384,22 @@ class QuarkAppHandler:
             is_valid, user_info = await test_manager.verify_cookies()
             
             if is_valid:
-                # Cookie有效，更新管理器
+                # Cookie有效，更新管理器，并关闭旧管理器的连接池
+                old_manager = self.manager
                 self.manager = test_manager
+                if old_manager:
+                    await old_manager.aclose()
                 # 同步最近转存目录
                 self.manager.recent_transfer_folders = self.manager.recent_transfer_folders[:5]
-                self.app.send_success("Cookie设置成功", f"用户：{user_info}\nCookie已保存并验证通过", touser=touser)
+                await self.app.send_success("Cookie设置成功", f"用户：{user_info}\nCookie已保存并验证通过", touser=touser)
                 return {'success': True, 'message': f'Cookie设置成功，用户：{user_info}'}
             else:
-                self.app.send_error("Cookie设置失败", user_info, touser=touser)
+                await test_manager.aclose()
+                await self.app.send_error("Cookie设置失败", user_info, touser=touser)
                 return {'success': False, 'message': user_info}
         except Exception as e:
             error_msg = f"设置Cookie时发生错误：{str(e)}"
-            self.app.send_error("Cookie设置失败", error_msg, touser=touser)
+            await self.app.send_error("Cookie设置失败", error_msg, touser=touser)
             return {'success': False, 'message': error_msg}
     
     async def process_text_with_links(self, text: str, touser: Optional[str] = None, generate_share: Optional[bool] = None) -> dict:
@@ -162,24 +416,24 @@ class QuarkAppHandler:
         """
         if not self.manager:
             error_msg = "文件管理器未初始化，请先设置Cookie"
-            self.app.send_error("处理失败", error_msg, touser=touser)
+            await self.app.send_error("处理失败", error_msg, touser=touser)
             return {'success': False, 'message': error_msg}
         
         try:
             # 验证Cookie是否有效
-            is_valid, user_info = await self.manager.verify_cookies()
+            is_valid, user_info = await self.manager.verify_cookies(use_cache=True)
             if not is_valid:
                 error_msg = f"Cookie已失效，请重新设置Cookie\n{user_info}"
-                self.app.send_warning("Cookie失效", error_msg, touser=touser)
+                await self.app.send_warning("Cookie失效", error_msg, touser=touser)
                 return {'success': False, 'message': error_msg, 'cookie_expired': True}
             
             # 提取所有夸克网盘链接
-            url_pattern = r'https?://pan\.quark\.cn/s/[^\s\)]+'
-            urls = re.findall(url_pattern, text)
+            # 去重并保持顺序（同一链接只转存一次，替换时会覆盖所有出现位置）
+            urls = list(dict.fromkeys(_QUARK_URL_RE.findall(text)))
             
             if not urls:
                 error_msg = "文本中未找到夸克网盘链接"
-                self.app.send_error("处理失败", error_msg, touser=touser)
+                await self.app.send_error("处理失败", error_msg, touser=touser)
                 return {'success': False, 'message': error_msg}
             
             # 获取保存目录
@@ -191,21 +445,23 @@ class QuarkAppHandler:
             user_key = touser if touser else 'default'
             if generate_share is None:
                 generate_share = self.user_transfer_share_mode.get(user_key, False)  # 默认False，只转存不分享
-            custom_print(f"[批量转存] 用户: {user_key}, 转存分享模式状态: {generate_share}, 所有用户状态: {self.user_transfer_share_mode}")
+            custom_print(f"[批量转存] 用户: {user_key}, 转存分享模式状态: {generate_share}, 分享模式用户数: {len(self.user_transfer_share_mode)}")
             
-            # 逐个处理链接（使用简洁逻辑，不重试，不等待）
-            # 收集所有链接的替换信息
-            result_text = text  # 保持原文结构
-            link_replacements = []  # 存储 (原链接, 新链接) 的对应关系
-            success_count = 0
+            # 并发处理链接（通过信号量限制同时处理的链接数，避免触发接口限流）
+            semaphore = asyncio.Semaphore(4)
             
-            for url in urls:
+            async def _handle(index: int, url: str) -> tuple[str, str, bool]:
+                """处理单个链接，返回 (原链接, 新链接, 是否转存成功)"""
+                async with semaphore:
+                    return await _handle_link(index, url)
+            
+            async def _handle_link(index: int, url: str) -> tuple[str, str, bool]:
                 try:
                     # 如果需要在转存分享模式下处理混合文件/文件夹，先检查文件结构
-                    match_password = re.search("pwd=(.*?)(?=$|&)", url)
+                    match_password = _PWD_RE.search(url)
                     password = match_password.group(1) if match_password else ""
-                    pwd_id = self.manager.get_pwd_id(url).split("#")[0]
-                    
+                    pwd_id = self.manager.get_pwd_id(url)
+                
                     current_folder_id = parent_folder_id
                     need_create_folder = False
                     folder_name_new = ''
@@ -214,14 +470,23 @@ class QuarkAppHandler:
                             stoken = await self.manager.get_stoken(pwd_id, password)
                             is_owner, data_list = await self.manager.get_detail(pwd_id, stoken)
                             if data_list:
-                                files_count = sum(1 for d in data_list if not d.get('dir', False))
-                                folders_count = sum(1 for d in data_list if d.get('dir', False))
+                                # 单次遍历判断是否同时包含文件和文件夹
+                                has_file = has_dir = False
+                                for d in data_list:
+                                    if d.dir:
+                                        has_dir = True
+                                    else:
+                                        has_file = True
+                                    if has_file and has_dir:
+                                        break
                                 # 如果同时有文件和文件夹，需要创建新文件夹
-                                if files_count > 0 and folders_count > 0:
+                                if has_file and has_dir:
                                     need_create_folder = True
                                     # 生成文件夹名称（使用时间戳，格式：转存_20260105_233853）
-                                    from utils import get_datetime
                                     folder_name_new = f"转存_{get_datetime(fmt='%Y%m%d_%H%M%S')}"
+                                    if len(urls) > 1:
+                                        # 并发处理时同一秒内可能创建多个文件夹，追加序号避免同名冲突
+                                        folder_name_new += f"_{index}"
                                     new_folder_id = await self.manager.create_dir_in_folder(parent_folder_id, folder_name_new)
                                     if new_folder_id:
                                         current_folder_id = new_folder_id
@@ -231,103 +496,53 @@ class QuarkAppHandler:
                                         need_create_folder = False
                         except Exception as e:
                             custom_print(f"检查文件结构失败: {str(e)}，使用默认转存逻辑", error_msg=True)
-                    
+                
                     # 转存文件
+                    # 转存完成后文件管理器会清除该文件夹的列表缓存（并发转存的其他链接缓存的旧列表也会失效）
                     result = await self.manager.save_share(url, current_folder_id)
-                    success_count += 1
 
                     # 过滤广告文件（仅对本次转存的文件名生效）
-                    saved_names = (result.get('files_list', []) or []) + (result.get('folders_list', []) or [])
-                    await self._filter_banned_files(current_folder_id, saved_names)
-                    
+                    saved_names = frozenset(chain(result.get('files_list') or (), result.get('folders_list') or ()))
+                    deleted_names = await self._filter_banned_files(current_folder_id, saved_names)
+                    saved_names -= deleted_names
+                
                     # 生成分享链接（仅在转存分享模式下）
                     new_link = url  # 默认使用原链接
-                    if generate_share:
+                    if generate_share and deleted_names and not saved_names:
+                        custom_print(f"[转存分享] 转存的文件均包含屏蔽词已被删除，跳过生成分享链接")
+                    elif generate_share:
                         try:
-                            custom_print(f"[转存分享] 开始生成分享链接，转存文件夹ID: {current_folder_id}")
-                            # 等待一下，确保文件已经转存完成
-                            await asyncio.sleep(2)  # 增加等待时间，确保转存完成
-                            
-                            if need_create_folder:
-                                # 如果创建了新文件夹，需要获取文件夹内所有文件/文件夹ID，然后生成分享链接
-                                custom_print(f"[转存分享] 获取新文件夹内的文件列表: {folder_name_new}")
-                                file_list_data = await self.manager.get_sorted_file_list(
-                                    pdir_fid=current_folder_id, page='1', size='100', 
-                                    fetch_total='false', sort='file_type:asc,updated_at:desc'
-                                )
-                                if file_list_data.get('code') == 0 and file_list_data.get('data', {}).get('list'):
-                                    # 提取所有文件/文件夹的fid
-                                    all_fids = [item['fid'] for item in file_list_data['data']['list']]
-                                    if all_fids:
-                                        # 使用所有文件/文件夹ID生成分享链接
-                                        share_url_new, title = await self.manager.create_share_link_multi(
-                                            all_fids, folder_name_new, expired_type=1, password='', ad_fid=self.ad_fid
-                                        )
-                                        new_link = share_url_new
-                                        link_replacements.append((url, new_link))
-                                        custom_print(f"[转存分享] 成功生成新文件夹内所有文件的分享链接: {share_url_new}")
-                                    else:
-                                        custom_print(f"[转存分享] 新文件夹内没有文件，无法生成分享链接", error_msg=True)
-                                        link_replacements.append((url, url))
-                                else:
-                                    custom_print(f"[转存分享] 获取新文件夹文件列表失败，无法生成分享链接", error_msg=True)
-                                    link_replacements.append((url, url))
-                            else:
-                                # 没有创建新文件夹，通过查询转存目标文件夹来获取转存后的文件
-                                custom_print(f"[转存分享] 查询转存目标文件夹内的文件: {current_folder_id}")
-                                file_list_data = await self.manager.get_sorted_file_list(
-                                    pdir_fid=current_folder_id, page='1', size='100', 
-                                    fetch_total='false', sort='file_type:asc,updated_at:desc'
-                                )
-                                
-                                if file_list_data.get('code') == 0 and file_list_data.get('data', {}).get('list'):
-                                    # 获取转存的文件名列表
-                                    saved_files = result.get('files_list', [])
-                                    saved_folders = result.get('folders_list', [])
-                                    
-                                    # 在文件列表中查找匹配的文件/文件夹（按名称匹配，取最新的）
-                                    matched_items = []
-                                    for item in file_list_data['data']['list']:
-                                        item_name = item.get('file_name', '')
-                                        # 检查是否是刚转存的文件（在转存列表中）
-                                        if item_name in saved_files or item_name in saved_folders:
-                                            matched_items.append(item)
-                                    
-                                    if matched_items:
-                                        # 使用第一个匹配的文件/文件夹生成分享链接
-                                        first_item = matched_items[0]
-                                        first_fid = first_item['fid']
-                                        first_file_name = first_item['file_name']
-                                        is_folder = first_item.get('dir', False) or first_item.get('file_type') == 0
-                                        
-                                        custom_print(f"[转存分享] 找到转存的文件: {first_file_name} (ID: {first_fid})")
-                                        share_url_new, title = await self.manager.create_share_link(
-                                            first_fid, first_file_name, expired_type=1, password='', ad_fid=self.ad_fid
-                                        )
-                                        new_link = share_url_new
-                                        link_replacements.append((url, new_link))
-                                        custom_print(f"[转存分享] 成功生成分享链接: {share_url_new}")
-                                    else:
-                                        custom_print(f"[转存分享] 未找到转存的文件，使用原链接", error_msg=True)
-                                        link_replacements.append((url, url))
-                                else:
-                                    custom_print(f"[转存分享] 获取文件夹文件列表失败，无法生成分享链接", error_msg=True)
-                                    link_replacements.append((url, url))
+                            share_url_new, _, _ = await self._resolve_share_link(
+                                current_folder_id, saved_names, need_create_folder, folder_name_new
+                            )
+                            if share_url_new:
+                                new_link = share_url_new
                         except Exception as e:
                             custom_print(f"[转存分享] 生成分享链接失败: {str(e)}", error_msg=True)
-                            import traceback
-                            custom_print(traceback.format_exc(), error_msg=True)
-                            link_replacements.append((url, url))  # 失败时保留原链接
-                    else:
-                        # 只转存模式，保留原链接
-                        link_replacements.append((url, url))
-                    
-                    # 替换链接（保持原文结构）
-                    result_text = result_text.replace(url, new_link, 1)
-                    
+                            _log_exc()
+                
+                    return url, new_link, True
+                
                 except Exception as e:
                     custom_print(f"处理链接 {url} 失败: {str(e)}", error_msg=True)
-                    link_replacements.append((url, url))  # 失败时保留原链接
+                    return url, url, False  # 失败时保留原链接
+            
+            results = await asyncio.gather(*(_handle(i, u) for i, u in enumerate(urls, 1)), return_exceptions=True)
+            
+            # 汇总各链接的处理结果
+            replacements: dict[str, str] = {}  # 原链接 -> 新链接
+            success_count = 0
+            for url, res in zip(urls, results):
+                if isinstance(res, BaseException):
+                    custom_print(f"处理链接 {url} 失败: {str(res)}", error_msg=True)
+                    replacements[url] = url
+                    continue
+                _, new_link, ok = res
+                if ok:
+                    success_count += 1
+                replacements[url] = new_link or url
+            # 一次扫描统一替换所有链接（保持原文结构）
+            result_text = _QUARK_URL_RE.sub(lambda m: replacements.get(m.group(0), m.group(0)), text)
             
             # 所有链接处理完毕，统一发送结果
             if generate_share:
@@ -335,10 +550,10 @@ class QuarkAppHandler:
                 # 第一条：转存完成消息（包含时间戳）
                 result_msg = f"处理链接数：{len(urls)}\n"
                 result_msg += f"成功转存：{success_count} 个"
-                self.app.send_success("批量转存完成", result_msg, touser=touser)
+                await self.app.send_success("批量转存完成", result_msg, touser=touser)
                 
                 # 第二条：完整的文章结构（不包含时间戳，方便直接复制分享）
-                self.app.send_text_message(result_text, touser=touser)
+                await self.app.send_text_message(result_text, touser=touser)
                 
                 # 自动退出转存分享模式（本次任务完成）
                 self.user_transfer_share_mode[user_key] = False
@@ -347,7 +562,7 @@ class QuarkAppHandler:
                 # 只转存模式：只发送转存完成消息
                 result_msg = f"处理链接数：{len(urls)}\n"
                 result_msg += f"成功转存：{success_count} 个"
-                self.app.send_success("批量转存完成", result_msg, touser=touser)
+                await self.app.send_success("批量转存完成", result_msg, touser=touser)
             
             return {
                 'success': True,
@@ -359,32 +574,150 @@ class QuarkAppHandler:
         except Exception as e:
             error_msg = f"处理文本失败：{str(e)}"
             custom_print(error_msg, error_msg=True)
-            self.app.send_error("处理失败", error_msg, touser=touser)
+            await self.app.send_error("处理失败", error_msg, touser=touser)
             return {'success': False, 'message': error_msg}
 
-    async def _filter_banned_files(self, folder_id: str, saved_names: list[str]):
-        """过滤广告文件（按配置关键词，仅针对本次转存的文件名）"""
+    async def _filter_banned_files(self, folder_id: str, saved_names: frozenset) -> frozenset:
+        """
+        过滤广告文件（按配置关键词，仅针对本次转存的文件名）
+        
+        Returns:
+            frozenset: 已删除的文件名（未过滤或过滤失败时为空集合）
+        """
         if not self.banned_keywords or not saved_names:
-            return
+            return frozenset()
         try:
-            file_list_data = await self.manager.get_sorted_file_list(
-                pdir_fid=folder_id, page='1', size='200',
-                fetch_total='false', sort='file_type:asc,updated_at:desc'
-            )
+            file_list_data = await self._listing(folder_id)
             if file_list_data.get('code') != 0:
                 custom_print(f"[广告过滤] 获取文件列表失败，跳过过滤：{file_list_data.get('message', '未知错误')}", error_msg=True)
-                return
+                return frozenset()
             items = file_list_data.get('data', {}).get('list', [])
             fids_to_delete = []
+            deleted_names = set()
             for item in items:
                 name = item.get('file_name', '')
-                if name in saved_names and any(k in name for k in self.banned_keywords):
+                if name in saved_names and self._hit_banned(name):
                     fids_to_delete.append(item.get('fid'))
+                    deleted_names.add(name)
             if fids_to_delete:
                 await self.manager.delete_files(fids_to_delete)
                 custom_print(f"[广告过滤] 已删除包含广告关键词的文件: {len(fids_to_delete)} 个")
+            return frozenset(deleted_names)
         except Exception as e:
             custom_print(f"[广告过滤] 过滤广告文件异常: {str(e)}", error_msg=True)
+            return frozenset()
+    
+    async def _listing(self, folder_id: str, size: str = '200', sort: str = 'file_type:asc,updated_at:desc',
+                       use_cache: bool = True) -> dict:
+        """获取文件夹列表（第一页，使用文件管理器的列表缓存）"""
+        return await self.manager.get_sorted_file_list(
+            pdir_fid=folder_id, page='1', size=size,
+            fetch_total='false', sort=sort, use_cache=use_cache
+        )
+    
+    def invalidate_listing_cache(self, folder_id: Optional[str] = None) -> None:
+        """网盘内容在本处理器之外发生变化后清除文件列表缓存，folder_id为None时清空全部"""
+        if self.manager:
+            self.manager.invalidate_list_cache(folder_id)
+    
+    async def _wait_until_present(self, folder_id: str, saved_union: frozenset, timeout: float = 10.0,
+                                  initial: float = 0.2, factor: float = 1.5) -> dict:
+        """
+        以指数退避轮询文件夹列表，直到本次转存的文件全部出现
+        
+        Args:
+            folder_id: 转存目标文件夹ID
+            saved_union: 本次转存且未被屏蔽词过滤删除的文件/文件夹名称集合
+            timeout: 最长等待时间（秒）
+            initial: 首次等待时间（秒）
+            factor: 每次等待时间的增长倍数
+        
+        Returns:
+            dict: 最后一次获取到的文件列表数据
+        """
+        deadline = time.monotonic() + timeout
+        delay = initial
+        use_cache = True  # 首次查询可复用广告过滤时刚获取的列表，之后的轮询必须重新获取
+        while True:
+            file_list_data = await self._listing(folder_id, use_cache=use_cache)
+            if file_list_data.get('code') == 0:
+                items = file_list_data.get('data', {}).get('list') or []
+                # 调用方已去掉被屏蔽词过滤删除的文件名，剩余文件全部出现即视为转存完成
+                if saved_union <= {item.get('file_name', '') for item in items}:
+                    return file_list_data
+            if time.monotonic() + delay > deadline:
+                custom_print(f"[转存分享] 等待转存文件出现超时，使用最后一次获取的文件列表", error_msg=True)
+                return file_list_data
+            await asyncio.sleep(delay)
+            delay *= factor
+            use_cache = False
+    
+    async def _resolve_share_link(self, folder_id: str, saved_union: frozenset, need_create_folder: bool,
+                                  folder_name_new: str = '') -> tuple[str, str, bool]:
+        """
+        为刚转存的文件生成分享链接
+        
+        Args:
+            folder_id: 转存目标文件夹ID
+            saved_union: 本次转存且未被屏蔽词过滤删除的文件/文件夹名称集合
+            need_create_folder: 是否为混合内容新建了文件夹（是则分享该文件夹内全部内容）
+            folder_name_new: 新建文件夹名称（用作分享标题）
+        
+        Returns:
+            tuple: (分享链接, 标题, 是否为文件夹)，未能生成时分享链接为空字符串
+        """
+        custom_print(f"[转存分享] 开始生成分享链接，转存文件夹ID: {folder_id}")
+        # 轮询直到转存的文件出现在目标文件夹中
+        file_list_data = await self._wait_until_present(folder_id, saved_union)
+        
+        if need_create_folder:
+            # 如果创建了新文件夹，需要获取文件夹内所有文件/文件夹ID，然后生成分享链接
+            custom_print(f"[转存分享] 获取新文件夹内的文件列表: {folder_name_new}")
+            if file_list_data.get('code') != 0 or not file_list_data.get('data', {}).get('list'):
+                custom_print(f"[转存分享] 获取新文件夹文件列表失败，无法生成分享链接", error_msg=True)
+                return '', '', False
+            # 提取所有文件/文件夹的fid
+            all_fids = [item['fid'] for item in file_list_data['data']['list']]
+            if not all_fids:
+                custom_print(f"[转存分享] 新文件夹内没有文件，无法生成分享链接", error_msg=True)
+                return '', '', False
+            # 使用所有文件/文件夹ID生成分享链接
+            share_url_new, title = await self.manager.create_share_link_multi(
+                all_fids, folder_name_new, expired_type=1, password='', ad_fid=self.ad_fid
+            )
+            custom_print(f"[转存分享] 成功生成新文件夹内所有文件的分享链接: {share_url_new}")
+            return share_url_new, title, True
+        
+        # 没有创建新文件夹，通过查询转存目标文件夹来获取转存后的文件
+        custom_print(f"[转存分享] 查询转存目标文件夹内的文件: {folder_id}")
+        if file_list_data.get('code') != 0 or not file_list_data.get('data', {}).get('list'):
+            custom_print(f"[转存分享] 获取文件夹文件列表失败，无法生成分享链接", error_msg=True)
+            return '', '', False
+        
+        # 在文件列表中查找匹配的文件/文件夹（按名称匹配，取最新的）
+        matched_items = []
+        for item in file_list_data['data']['list']:
+            item_name = item.get('file_name', '')
+            # 检查是否是刚转存的文件（在转存列表中）
+            if item_name in saved_union:
+                matched_items.append(item)
+        
+        if not matched_items:
+            custom_print(f"[转存分享] 未找到转存的文件", error_msg=True)
+            return '', '', False
+        
+        # 使用第一个匹配的文件/文件夹生成分享链接
+        first_item = matched_items[0]
+        first_fid = first_item['fid']
+        first_file_name = first_item['file_name']
+        is_folder = bool(first_item.get('dir', False) or first_item.get('file_type') == 0)
+        
+        custom_print(f"[转存分享] 找到转存的文件: {first_file_name} (ID: {first_fid})")
+        share_url_new, title = await self.manager.create_share_link(
+            first_fid, first_file_name, expired_type=1, password='', ad_fid=self.ad_fid
+        )
+        custom_print(f"[转存分享] 成功生成分享链接: {share_url_new}")
+        return share_url_new, title, is_folder
     
     async def process_share_url(self, share_url: str, original_text: Optional[str] = None, touser: Optional[str] = None) -> dict:
         """
@@ -400,15 +733,15 @@ class QuarkAppHandler:
         """
         if not self.manager:
             error_msg = "文件管理器未初始化，请先设置Cookie"
-            self.app.send_error("处理失败", error_msg, touser=touser)
+            await self.app.send_error("处理失败", error_msg, touser=touser)
             return {'success': False, 'message': error_msg}
         
         try:
             # 验证Cookie是否有效
-            is_valid, user_info = await self.manager.verify_cookies()
+            is_valid, user_info = await self.manager.verify_cookies(use_cache=True)
             if not is_valid:
                 error_msg = f"Cookie已失效，请重新设置Cookie\n{user_info}"
-                self.app.send_warning("Cookie失效", error_msg, touser=touser)
+                await self.app.send_warning("Cookie失效", error_msg, touser=touser)
                 return {'success': False, 'message': error_msg, 'cookie_expired': True}
             
             # 获取保存目录
@@ -419,28 +752,35 @@ class QuarkAppHandler:
             # 判断是否需要生成分享链接
             user_key = touser if touser else 'default'
             generate_share = self.user_transfer_share_mode.get(user_key, False)  # 默认False，只转存不分享
-            custom_print(f"[转存分享] 用户: {user_key}, 转存分享模式状态: {generate_share}, 所有用户状态: {self.user_transfer_share_mode}")
+            custom_print(f"[转存分享] 用户: {user_key}, 转存分享模式状态: {generate_share}, 分享模式用户数: {len(self.user_transfer_share_mode)}")
             
             # 如果需要在转存分享模式下处理混合文件/文件夹，先检查文件结构
             # 提取密码和pwd_id
-            match_password = re.search("pwd=(.*?)(?=$|&)", share_url)
+            match_password = _PWD_RE.search(share_url)
             password = match_password.group(1) if match_password else ""
-            pwd_id = self.manager.get_pwd_id(share_url).split("#")[0]
+            pwd_id = self.manager.get_pwd_id(share_url)
             
             # 如果需要在转存分享模式下处理混合情况，先获取文件详情
             need_create_folder = False
+            folder_name_new = ''
             if generate_share and pwd_id:
                 try:
                     stoken = await self.manager.get_stoken(pwd_id, password)
                     is_owner, data_list = await self.manager.get_detail(pwd_id, stoken)
                     if data_list:
-                        files_count = sum(1 for d in data_list if not d.get('dir', False))
-                        folders_count = sum(1 for d in data_list if d.get('dir', False))
+                        # 单次遍历判断是否同时包含文件和文件夹
+                        has_file = has_dir = False
+                        for d in data_list:
+                            if d.dir:
+                                has_dir = True
+                            else:
+                                has_file = True
+                            if has_file and has_dir:
+                                break
                         # 如果同时有文件和文件夹，需要创建新文件夹
-                        if files_count > 0 and folders_count > 0:
+                        if has_file and has_dir:
                             need_create_folder = True
                             # 生成文件夹名称（使用时间戳，格式：转存_20260105_233853）
-                            from utils import get_datetime
                             folder_name_new = f"转存_{get_datetime(fmt='%Y%m%d_%H%M%S')}"
                             new_folder_id = await self.manager.create_dir_in_folder(folder_id, folder_name_new)
                             if new_folder_id:
@@ -456,117 +796,55 @@ class QuarkAppHandler:
             result = await self.manager.save_share(share_url, folder_id)
 
             # 过滤广告文件（仅针对本次转存的文件名）
-            saved_names = (result.get('files_list', []) or []) + (result.get('folders_list', []) or [])
-            await self._filter_banned_files(folder_id, saved_names)
+            saved_names = frozenset(chain(result.get('files_list') or (), result.get('folders_list') or ()))
+            deleted_names = await self._filter_banned_files(folder_id, saved_names)
+            saved_names -= deleted_names
             
             # 生成分享链接（仅在转存分享模式下）
             share_info = []
             
-            if generate_share:
+            if generate_share and deleted_names and not saved_names:
+                custom_print(f"[转存分享] 转存的文件均包含屏蔽词已被删除，跳过生成分享链接")
+            elif generate_share:
                 try:
-                    custom_print(f"[转存分享] 开始生成分享链接，转存文件夹ID: {folder_id}")
-                    # 等待一下，确保文件已经转存完成
-                    await asyncio.sleep(2)  # 增加等待时间，确保转存完成
-                    
-                    if need_create_folder:
-                        # 如果创建了新文件夹，需要获取文件夹内所有文件/文件夹ID，然后生成分享链接
-                        custom_print(f"[转存分享] 获取新文件夹内的文件列表: {folder_name_new}")
-                        file_list_data = await self.manager.get_sorted_file_list(
-                            pdir_fid=folder_id, page='1', size='100', 
-                            fetch_total='false', sort='file_type:asc,updated_at:desc'
-                        )
-                        if file_list_data.get('code') == 0 and file_list_data.get('data', {}).get('list'):
-                            # 提取所有文件/文件夹的fid
-                            all_fids = [item['fid'] for item in file_list_data['data']['list']]
-                            if all_fids:
-                                # 使用所有文件/文件夹ID生成分享链接
-                                share_url_new, title = await self.manager.create_share_link_multi(
-                                    all_fids, folder_name_new, expired_type=1, password='', ad_fid=self.ad_fid
-                                )
-                                icon = "📁"
-                                share_info.append({
-                                    'title': title,
-                                    'url': share_url_new,
-                                    'icon': icon
-                                })
-                                custom_print(f"[转存分享] 成功生成新文件夹内所有文件的分享链接: {share_url_new}")
-                            else:
-                                custom_print(f"[转存分享] 新文件夹内没有文件，无法生成分享链接", error_msg=True)
-                        else:
-                            custom_print(f"[转存分享] 获取新文件夹文件列表失败，无法生成分享链接", error_msg=True)
-                    else:
-                        # 没有创建新文件夹，通过查询转存目标文件夹来获取转存后的文件
-                        custom_print(f"[转存分享] 查询转存目标文件夹内的文件: {folder_id}")
-                        file_list_data = await self.manager.get_sorted_file_list(
-                            pdir_fid=folder_id, page='1', size='100', 
-                            fetch_total='false', sort='file_type:asc,updated_at:desc'
-                        )
-                        
-                        if file_list_data.get('code') == 0 and file_list_data.get('data', {}).get('list'):
-                            # 获取转存的文件名列表
-                            saved_files = result.get('files_list', [])
-                            saved_folders = result.get('folders_list', [])
-                            
-                            # 在文件列表中查找匹配的文件/文件夹（按名称匹配，取最新的）
-                            matched_items = []
-                            for item in file_list_data['data']['list']:
-                                item_name = item.get('file_name', '')
-                                # 检查是否是刚转存的文件（在转存列表中）
-                                if item_name in saved_files or item_name in saved_folders:
-                                    matched_items.append(item)
-                            
-                            if matched_items:
-                                # 使用第一个匹配的文件/文件夹生成分享链接
-                                first_item = matched_items[0]
-                                first_fid = first_item['fid']
-                                first_file_name = first_item['file_name']
-                                is_folder = first_item.get('dir', False) or first_item.get('file_type') == 0
-                                
-                                custom_print(f"[转存分享] 找到转存的文件: {first_file_name} (ID: {first_fid})")
-                                share_url_new, title = await self.manager.create_share_link(
-                                    first_fid, first_file_name, expired_type=1, password='', ad_fid=self.ad_fid
-                                )
-                                icon = "📁" if is_folder else "📄"
-                                share_info.append({
-                                    'title': title,
-                                    'url': share_url_new,
-                                    'icon': icon
-                                })
-                                custom_print(f"[转存分享] 成功生成分享链接: {share_url_new}")
-                            else:
-                                custom_print(f"[转存分享] 未找到转存的文件", error_msg=True)
-                        else:
-                            custom_print(f"[转存分享] 获取文件夹文件列表失败，无法生成分享链接", error_msg=True)
+                    share_url_new, title, is_folder = await self._resolve_share_link(
+                        folder_id, saved_names, need_create_folder, folder_name_new
+                    )
+                    if share_url_new:
+                        share_info.append({
+                            'title': title,
+                            'url': share_url_new,
+                            'icon': "📁" if is_folder else "📄"
+                        })
                 except Exception as e:
                     custom_print(f"[转存分享] 生成分享链接失败: {str(e)}", error_msg=True)
-                    import traceback
-                    custom_print(traceback.format_exc(), error_msg=True)
+                    _log_exc()
             
             # 构建返回消息
             if generate_share:
                 # 转存分享模式
                 if share_info:
                     # 成功生成分享链接：发送两条消息
-                    self.app.send_success("转存完成", "✅ 转存完成！", touser=touser)
+                    await self.app.send_success("转存完成", "✅ 转存完成！", touser=touser)
                     share_item = share_info[0]
                     # 如果有原始文本，保留原文章结构并替换链接
                     if original_text:
                         result_text = original_text.replace(share_url, share_item['url'], 1)
-                        self.app.send_text_message(result_text, touser=touser)
+                        await self.app.send_text_message(result_text, touser=touser)
                     else:
                         # 如果没有原始文本，发送格式化链接
                         share_msg = f"{share_item['icon']} {share_item['title']}\n\n🔗 {share_item['url']}"
-                        self.app.send_success("分享链接", share_msg, touser=touser)
+                        await self.app.send_success("分享链接", share_msg, touser=touser)
                 else:
                     # 转存成功但生成分享链接失败：只发送转存完成消息
-                    self.app.send_success("转存完成", "✅ 转存完成！\n\n⚠️ 生成分享链接失败，但文件已成功转存", touser=touser)
+                    await self.app.send_success("转存完成", "✅ 转存完成！\n\n⚠️ 生成分享链接失败，但文件已成功转存", touser=touser)
                 
                 # 无论是否成功生成分享链接，都自动退出转存分享模式
                 self.user_transfer_share_mode[user_key] = False
                 custom_print(f"用户 {user_key} 已退出转存分享模式（本次任务完成）")
             else:
                 # 只转存模式：只发送一条简洁消息
-                self.app.send_success("转存完成", "✅ 转存完成！", touser=touser)
+                await self.app.send_success("转存完成", "✅ 转存完成！", touser=touser)
             
             return {
                 'success': True,
@@ -577,86 +855,122 @@ class QuarkAppHandler:
             
         except Exception as e:
             error_msg = f"处理分享链接失败：{str(e)}"
-            self.app.send_error("处理失败", error_msg, touser=touser)
+            await self.app.send_error("处理失败", error_msg, touser=touser)
             return {'success': False, 'message': error_msg}
     
-    async def _search_files_recursive(self, folder_id: str, keyword: str, current_path: str = "", 
-                                      visited_folders: set = None, max_depth: int = 10, current_depth: int = 0) -> tuple[list, list]:
+    async def _list_all_pages(self, folder_id: str, sort: str = 'file_name:asc', size: int = 100,
+                              sem: Optional[asyncio.Semaphore] = None) -> Optional[list]:
+        """
+        获取文件夹的全部文件列表（首页获取总数后并发拉取剩余页；SEARCH_LIST_MAX_AGE秒内的分页缓存直接复用，
+        重复搜索不必重新请求）
+        
+        Args:
+            folder_id: 文件夹ID
+            sort: 排序方式
+            size: 每页数量
+            sem: 限制同时请求数的信号量（同一次搜索共用一个；未传入时只限制本文件夹的分页请求）
+        
+        Returns:
+            list: 文件列表，首页获取失败时返回None
+        """
+        if sem is None:
+            sem = asyncio.Semaphore(self.SEARCH_CONCURRENCY)
+        
+        # 仅请求受信号量限制，避免子目录等待时占用名额导致死锁
+        async def _fetch(page: int, fetch_total: str = 'false') -> dict:
+            async with sem:
+                return await self.manager.get_sorted_file_list(
+                    pdir_fid=folder_id, page=str(page), size=str(size),
+                    fetch_total=fetch_total, sort=sort, max_age=self.SEARCH_LIST_MAX_AGE
+                )
+        
+        first_page = await _fetch(1, fetch_total='1')
+        if first_page.get('code') != 0:
+            return None
+        
+        data = first_page.get('data', {})
+        file_list = list(data.get('list', []) if isinstance(data, dict) else [])
+        total = (first_page.get('metadata') or {}).get('_total') or 0
+        total_pages = -(-total // size)
+        if total_pages <= 1:
+            return file_list
+        
+        # 并发获取剩余页
+        rest = await asyncio.gather(*(_fetch(p) for p in range(2, total_pages + 1)), return_exceptions=True)
+        for page, res in enumerate(rest, 2):
+            if isinstance(res, BaseException) or res.get('code') != 0:
+                custom_print(f"[搜索] 获取文件夹 {folder_id} 第{page}页失败", error_msg=True)
+                continue
+            page_data = res.get('data', {})
+            file_list.extend(page_data.get('list', []) if isinstance(page_data, dict) else [])
+        return file_list
+    
+    async def _search_files_recursive(self, folder_id: str, keyword_lc: str, current_path: str = "", 
+                                      visited_folders: frozenset[str] = frozenset(), max_depth: int = 10, current_depth: int = 0,
+                                      files: list = None, folders: list = None,
+                                      first_page_ready: Optional[asyncio.Event] = None,
+                                      sem: Optional[asyncio.Semaphore] = None) -> tuple[list, list]:
         """
         递归搜索文件夹及其子文件夹中的文件
         
         Args:
             folder_id: 文件夹ID
-            keyword: 搜索关键词
+            keyword_lc: 搜索关键词（已casefold）
             current_path: 当前路径（用于显示文件位置）
-            visited_folders: 已访问的文件夹集合（防止循环）
+            visited_folders: 当前分支上已访问的文件夹（不可变快照，每个分支各自一份，防止循环）
             max_depth: 最大搜索深度
             current_depth: 当前深度
+            files: 文件结果列表（递归共享，直接追加）
+            folders: 文件夹结果列表（递归共享，直接追加）
+            first_page_ready: 匹配的文件数足够填满第一页时置位的事件（用于提前显示第一页）
+            sem: 限制本次搜索同时请求文件列表数量的信号量（递归共享）
         
         Returns:
             tuple: (文件列表, 文件夹列表)
         """
-        if visited_folders is None:
-            visited_folders = set()
+        if files is None:
+            files = []
+        if folders is None:
+            folders = []
         
         # 防止循环和过深递归
         if folder_id in visited_folders or current_depth >= max_depth:
-            return [], []
+            return files, folders
         
-        visited_folders.add(folder_id)
-        files = []
-        folders = []
+        visited_folders = visited_folders | {folder_id}
         
         try:
-            # 获取当前文件夹中的文件列表
-            file_list_data = await self.manager.get_sorted_file_list(
-                pdir_fid=folder_id, page='1', size='100', 
-                fetch_total='false', sort='file_name:asc'
-            )
-            
-            if file_list_data.get('code') != 0:
+            # 获取当前文件夹中的全部文件列表
+            file_list = await self._list_all_pages(folder_id, sort='file_name:asc', sem=sem)
+            if file_list is None:
                 return files, folders
             
-            data = file_list_data.get('data', {})
-            file_list = data.get('list', []) if isinstance(data, dict) else []
+            # 先分类一次，再分别筛选匹配项和子文件夹
+            path = current_path or "根目录"
+            dirs = [it for it in file_list if _is_dir(it)]
+            folders.extend([_make_folder(it, path) for it in dirs if keyword_lc in it.get('file_name', '').casefold()])
+            files.extend([_make_file(it, path) for it in file_list
+                          if not _is_dir(it) and keyword_lc in it.get('file_name', '').casefold()])
             
-            # 在当前文件夹中搜索匹配的文件
-            for item in file_list:
-                file_name = item.get('file_name', '')
-                is_dir = item.get('dir') or item.get('file_type') == 0
-                
-                # 检查文件名是否匹配关键词
-                if keyword.lower() in file_name.lower():
-                    # 构建完整路径
-                    full_path = f"{current_path}/{file_name}" if current_path else file_name
-                    if is_dir:
-                        folders.append({
-                            'fid': item['fid'],
-                            'name': file_name,
-                            'type': '文件夹',
-                            'path': current_path if current_path else "根目录"
-                        })
-                    else:
-                        files.append({
-                            'fid': item['fid'],
-                            'name': file_name,
-                            'type': '文件',
-                            'size': item.get('size', 0),
-                            'path': current_path if current_path else "根目录"
-                        })
-                
-                # 如果是文件夹，递归搜索子文件夹
-                if is_dir:
-                    sub_folder_id = item['fid']
-                    sub_folder_name = file_name
-                    sub_path = f"{current_path}/{sub_folder_name}" if current_path else sub_folder_name
-                    
-                    # 递归搜索子文件夹
-                    sub_files, sub_folders = await self._search_files_recursive(
-                        sub_folder_id, keyword, sub_path, visited_folders, max_depth, current_depth + 1
-                    )
-                    files.extend(sub_files)
-                    folders.extend(sub_folders)
+            # 收集所有子文件夹的递归搜索任务
+            sub_tasks = [
+                self._search_files_recursive(
+                    it['fid'], keyword_lc, f"{current_path}/{it.get('file_name', '')}" if current_path else it.get('file_name', ''),
+                    visited_folders, max_depth, current_depth + 1, files, folders, first_page_ready, sem
+                )
+                for it in dirs
+            ]
+            
+            # 文件排在文件夹之前且只会追加，第一页的文件凑满后位置就不会再变，可以提前显示
+            if first_page_ready is not None and len(files) >= self.SEARCH_PAGE_SIZE:
+                first_page_ready.set()
+            
+            # 并发搜索所有子文件夹（各分支持有各自的visited_folders快照，无共享可变状态）
+            if sub_tasks:
+                results = await asyncio.gather(*sub_tasks, return_exceptions=True)
+                for res in results:
+                    if isinstance(res, BaseException):
+                        custom_print(f"[搜索] 搜索子文件夹时出错: {str(res)}", error_msg=True)
         
         except Exception as e:
             custom_print(f"[搜索] 搜索文件夹 {folder_id} 时出错: {str(e)}", error_msg=True)
@@ -677,45 +991,66 @@ class QuarkAppHandler:
         """
         if not self.manager:
             error_msg = "文件管理器未初始化，请先设置Cookie"
-            self.app.send_error("搜索失败", error_msg, touser=touser)
+            await self.app.send_error("搜索失败", error_msg, touser=touser)
             return {'success': False, 'message': error_msg}
         
         try:
             # 验证Cookie是否有效
-            is_valid, user_info = await self.manager.verify_cookies()
+            is_valid, user_info = await self.manager.verify_cookies(use_cache=True)
             if not is_valid:
                 error_msg = f"Cookie已失效，请重新设置Cookie\n{user_info}"
-                self.app.send_warning("Cookie失效", error_msg, touser=touser)
+                await self.app.send_warning("Cookie失效", error_msg, touser=touser)
                 return {'success': False, 'message': error_msg, 'cookie_expired': True}
             
             # 发送搜索开始消息（不使用send_info，避免时间戳问题）
             search_start_msg = f"🔍 开始搜索（递归搜索子文件夹）\n\n正在搜索文件夹（ID: {folder_id}）及其子文件夹中的文件...\n关键词：{keyword}"
-            self.app.send_text_message(search_start_msg, touser=touser)
+            await self.app.send_text_message(search_start_msg, touser=touser)
             
             # 递归搜索所有子文件夹
             custom_print(f"[搜索] 开始递归搜索 - 文件夹ID: {folder_id}, 关键词: {keyword}")
-            # 获取根文件夹名称（用于显示路径）
-            root_folder_name = "根目录"
-            if folder_id != '0':
-                try:
-                    root_list = await self.manager.get_sorted_file_list(
-                        pdir_fid=folder_id, page='1', size='1', 
-                        fetch_total='false', sort='file_name:asc'
-                    )
-                    # 这里无法直接获取文件夹名称，使用ID作为路径标识
-                    root_folder_name = f"文件夹({folder_id[:8]}...)"
-                except:
-                    root_folder_name = "根目录"
+            # 根文件夹名称（用于显示路径）；列表接口拿不到文件夹自身名称，非根目录使用ID作为路径标识
+            root_folder_name = "根目录" if folder_id == '0' else f"文件夹({folder_id[:8]}...)"
             
-            files, folders = await self._search_files_recursive(folder_id, keyword, root_folder_name)
+            # 每次搜索各自的并发限制（不同用户同时搜索时互不影响）
+            sem = asyncio.Semaphore(self.SEARCH_CONCURRENCY)
+            files, folders = [], []
+            first_page_ready = asyncio.Event()
+            scan = asyncio.create_task(self._search_files_recursive(
+                folder_id, keyword.casefold(), root_folder_name,
+                files=files, folders=folders, first_page_ready=first_page_ready, sem=sem
+            ))
+            scan.add_done_callback(lambda _: first_page_ready.set())
+            
+            # 第一页凑满（或搜索结束）即返回，不必等整个目录树扫描完成
+            await first_page_ready.wait()
+            user_key = touser if touser else 'default'
+            preview = None
+            if not scan.done():
+                custom_print(f"[搜索] 第一页结果已就绪，继续在后台搜索")
+                # 保存当前结果的快照：后台扫描追加的文件会让文件夹的序号后移，
+                # 扫描期间翻页/按序号选择都基于快照，保证序号与显示一致，扫描完成后再整体替换
+                files_snapshot, folders_snapshot = files[:], folders[:]
+                preview = {
+                    'keyword': keyword,
+                    'folder_id': folder_id,
+                    'files': files_snapshot,
+                    'folders': folders_snapshot,
+                    'total': len(files_snapshot) + len(folders_snapshot),
+                    'total_pages': -(-(len(files_snapshot) + len(folders_snapshot)) // self.SEARCH_PAGE_SIZE),  # 向上取整
+                    'files_count': len(files_snapshot),
+                    'folders_count': len(folders_snapshot),
+                    'current_page': 1
+                }
+                self.user_search_results[user_key] = preview
+                await self._display_search_results_page(user_key, touser=touser)
+                await scan
             
-            all_items = files + folders
-            total = len(all_items)
+            total = len(files) + len(folders)
             
             custom_print(f"[搜索] 搜索完成 - 匹配项: {total} (文件: {len(files)}, 文件夹: {len(folders)})")
             
             if total == 0:
-                self.app.send_warning("搜索结果", f"未找到包含关键词 '{keyword}' 的文件或文件夹", touser=touser)
+                await self.app.send_warning("搜索结果", f"未找到包含关键词 '{keyword}' 的文件或文件夹", touser=touser)
                 return {
                     'success': True,
                     'keyword': keyword,
@@ -725,25 +1060,38 @@ class QuarkAppHandler:
                 }
             
             # 保存搜索结果（按用户ID保存，保存所有结果）
-            user_key = touser if touser else 'default'
-            self.user_search_results[user_key] = {
-                'keyword': keyword,
-                'folder_id': folder_id,
-                'items': all_items,  # 保存所有结果
-                'total': total,
-                'files_count': len(files),
-                'folders_count': len(folders),
-                'current_page': 1  # 初始页码为1
-            }
-            
-            # 显示第一页搜索结果
-            await self._display_search_results_page(user_key, touser=touser)
+            if preview is not None:
+                # 第一页已提前显示，用完整结果替换快照（保留用户可能已翻到的页码）；
+                # 扫描期间用户已发起新的搜索时不覆盖新结果
+                if self.user_search_results.get(user_key) is preview:
+                    preview.update(files=files, folders=folders, total=total,
+                                   total_pages=-(-total // self.SEARCH_PAGE_SIZE),
+                                   files_count=len(files), folders_count=len(folders))
+                    done_msg = f"✅ 搜索完成，共找到 {total} 个匹配项（文件：{len(files)} 个，文件夹：{len(folders)} 个）"
+                    if folders_snapshot and len(files) != len(files_snapshot):
+                        done_msg += "\n结果已更新，文件夹序号有变化，请重新查看当前页后再按序号选择"
+                    await self.app.send_text_message(done_msg, touser=touser)
+            else:
+                self.user_search_results[user_key] = {
+                    'keyword': keyword,
+                    'folder_id': folder_id,
+                    'files': files,  # 保存所有结果（文件在前、文件夹在后，分开存放避免拼接拷贝）
+                    'folders': folders,
+                    'total': total,
+                    'total_pages': -(-total // self.SEARCH_PAGE_SIZE),  # 向上取整，只在搜索时计算一次
+                    'files_count': len(files),
+                    'folders_count': len(folders),
+                    'current_page': 1  # 初始页码为1
+                }
+                
+                # 显示第一页搜索结果
+                await self._display_search_results_page(user_key, touser=touser)
             
             return {
                 'success': True,
                 'keyword': keyword,
                 'folder_id': folder_id,
-                'items': all_items[:20],
+                'items': [item._asdict() for item in islice(chain(files, folders), 20)],
                 'total': total,
                 'files_count': len(files),
                 'folders_count': len(folders)
@@ -752,9 +1100,8 @@ class QuarkAppHandler:
         except Exception as e:
             error_msg = f"搜索文件失败：{str(e)}"
             custom_print(error_msg, error_msg=True)
-            import traceback
-            custom_print(traceback.format_exc(), error_msg=True)
-            self.app.send_error("搜索失败", error_msg, touser=touser)
+            _log_exc()
+            await self.app.send_error("搜索失败", error_msg, touser=touser)
             return {'success': False, 'message': error_msg}
     
     async def _display_search_results_page(self, user_key: str, page: int = None, touser: Optional[str] = None) -> None:
@@ -770,41 +1117,28 @@ class QuarkAppHandler:
         if not search_result:
             return
         
-        items = search_result.get('items', [])
-        total = search_result.get('total', 0)
-        files_count = search_result.get('files_count', 0)
-        folders_count = search_result.get('folders_count', 0)
-        
-        if not items or total == 0:
+        total = search_result['total']
+        if total == 0:
             return
         
         # 每页显示7个结果（因为还有标题和翻页提示，总共最多8个article）
-        items_per_page = 7
-        total_pages = (total + items_per_page - 1) // items_per_page  # 向上取整
+        items_per_page = self.SEARCH_PAGE_SIZE
+        total_pages = search_result['total_pages']  # 搜索时已计算
         
-        # 确定要显示的页码
-        if page is None:
-            current_page = search_result.get('current_page', 1)
-        else:
-            current_page = page
-            search_result['current_page'] = current_page
-        
-        # 确保页码在有效范围内
-        if current_page < 1:
-            current_page = 1
-        elif current_page > total_pages:
-            current_page = total_pages
-            search_result['current_page'] = current_page
+        # 设置页码时一次性限制在有效范围内，之后直接读取
+        if page is not None:
+            search_result['current_page'] = min(max(page, 1), total_pages)
+        current_page = search_result['current_page']
         
         # 计算当前页的起始和结束索引
         start_idx = (current_page - 1) * items_per_page
         end_idx = min(start_idx + items_per_page, total)
-        display_items = items[start_idx:end_idx]
+        display_items = _search_page(search_result, start_idx, end_idx)
         
         articles = []
         # 第一个卡片显示总体信息和页码
         summary_title = f"✅ 找到 {total} 个匹配项（第 {current_page}/{total_pages} 页）"
-        summary_desc = f"文件：{files_count} 个，文件夹：{folders_count} 个\n回复序号（{start_idx + 1}-{end_idx}）生成分享链接"
+        summary_desc = f"文件：{search_result['files_count']} 个，文件夹：{search_result['folders_count']} 个\n回复序号（{start_idx + 1}-{end_idx}）生成分享链接"
         if total_pages > 1:
             summary_desc += f"\n输入 'n' 下一页，'p' 上一页"
         
@@ -816,35 +1150,10 @@ class QuarkAppHandler:
         })
         
         # 添加当前页的搜索结果项
-        for idx, item in enumerate(display_items, start_idx + 1):
-            # 构建标题：序号 + 类型 + 名称
-            title = f"{idx}. [{item['type']}] {item['name']}"
-            # 描述信息（显示路径和大小）
-            description = f"类型：{item['type']}"
-            if item.get('path'):
-                description += f"\n路径：{item['path']}"
-            if item.get('size'):
-                # 格式化文件大小
-                size = item['size']
-                if size < 1024:
-                    size_str = f"{size} B"
-                elif size < 1024 * 1024:
-                    size_str = f"{size / 1024:.2f} KB"
-                elif size < 1024 * 1024 * 1024:
-                    size_str = f"{size / (1024 * 1024):.2f} MB"
-                else:
-                    size_str = f"{size / (1024 * 1024 * 1024):.2f} GB"
-                description += f"\n大小：{size_str}"
-            
-            articles.append({
-                "title": title,
-                "description": description,
-                "picurl": "",
-                "url": ""
-            })
+        articles.extend([_search_item_article(idx, item) for idx, item in enumerate(display_items, start_idx + 1)])
         
         # 发送卡片式消息
-        self.app.send_news_message(articles, touser=touser)
+        await self.app.send_news_message(articles, touser=touser)
     
     async def create_share_from_search(self, index: int, touser: Optional[str] = None) -> dict:
         """
@@ -859,7 +1168,7 @@ class QuarkAppHandler:
         """
         if not self.manager:
             error_msg = "文件管理器未初始化，请先设置Cookie"
-            self.app.send_error("生成失败", error_msg, touser=touser)
+            await self.app.send_error("生成失败", error_msg, touser=touser)
             return {'success': False, 'message': error_msg}
         
         # 获取用户的搜索结果
@@ -868,73 +1177,97 @@ class QuarkAppHandler:
         
         if not last_search_result:
             error_msg = "没有可用的搜索结果，请先搜索文件"
-            self.app.send_error("生成失败", error_msg, touser=touser)
+            await self.app.send_error("生成失败", error_msg, touser=touser)
             return {'success': False, 'message': error_msg}
         
         try:
-            items = last_search_result.get('items', [])
+            total = last_search_result.get('total', 0)
             
-            if not items:
+            if not total:
                 error_msg = "搜索结果为空"
-                self.app.send_error("生成失败", error_msg, touser=touser)
+                await self.app.send_error("生成失败", error_msg, touser=touser)
                 return {'success': False, 'message': error_msg}
             
-            if index < 1 or index > len(items):
-                error_msg = f"索引无效，请输入1-{len(items)}之间的数字"
-                self.app.send_error("生成失败", error_msg, touser=touser)
+            if index < 1 or index > total:
+                error_msg = f"索引无效，请输入1-{total}之间的数字"
+                await self.app.send_error("生成失败", error_msg, touser=touser)
                 return {'success': False, 'message': error_msg}
             
-            selected_item = items[index - 1]
+            selected_item = _search_item_at(last_search_result, index - 1)
             
-            self.app.send_info("开始生成", f"正在为 {selected_item['type']} 生成分享链接...\n名称：{selected_item['name']}", touser=touser)
+            await self.app.send_info("开始生成", f"正在为 {selected_item.type} 生成分享链接...\n名称：{selected_item.name}", touser=touser)
             
             # 生成分享链接
             share_url, title = await self.manager.create_share_link(
-                selected_item['fid'], selected_item['name'], 
+                selected_item.fid, selected_item.name, 
                 expired_type=1, password='', ad_fid=self.ad_fid
             )
             
             # 构建简洁美观的消息格式
-            type_icon = "📁" if selected_item['type'] == '文件夹' else "📄"
+            type_icon = _TYPE_ICONS.get(selected_item.type, "📄")
             result_msg = f"{type_icon} {title}\n\n"
             result_msg += f"🔗 {share_url}"
             
-            self.app.send_success("分享链接", result_msg, touser=touser)
+            await self.app.send_success("分享链接", result_msg, touser=touser)
             
             return {
                 'success': True,
                 'message': '分享链接生成成功',
                 'share_url': share_url,
                 'title': title,
-                'item': selected_item
+                'item': selected_item._asdict()
             }
             
         except Exception as e:
             error_msg = f"生成分享链接失败：{str(e)}"
             custom_print(error_msg, error_msg=True)
-            self.app.send_error("生成失败", error_msg, touser=touser)
+            await self.app.send_error("生成失败", error_msg, touser=touser)
             return {'success': False, 'message': error_msg}
     
     async def verify_cookie(self, touser: Optional[str] = None) -> dict:
         """验证当前Cookie是否有效"""
         if not self.manager:
-            self.app.send_error("验证失败", "文件管理器未初始化", touser=touser)
+            await self.app.send_error("验证失败", "文件管理器未初始化", touser=touser)
             return {'success': False, 'message': '文件管理器未初始化'}
         
         try:
             is_valid, user_info = await self.manager.verify_cookies()
             if is_valid:
-                self.app.send_success("Cookie验证", f"Cookie有效\n用户：{user_info}", touser=touser)
+                await self.app.send_success("Cookie验证", f"Cookie有效\n用户：{user_info}", touser=touser)
                 return {'success': True, 'message': f'Cookie有效，用户：{user_info}'}
             else:
-                self.app.send_warning("Cookie失效", user_info, touser=touser)
+                await self.app.send_warning("Cookie失效", user_info, touser=touser)
                 return {'success': False, 'message': user_info, 'cookie_expired': True}
         except Exception as e:
             error_msg = f"验证Cookie失败：{str(e)}"
-            self.app.send_error("验证失败", error_msg, touser=touser)
+            await self.app.send_error("验证失败", error_msg, touser=touser)
             return {'success': False, 'message': error_msg}
 
 
+def _aes_cbc_decrypt(key: bytes, iv: bytes, data: bytes) -> bytes:
+    """AES-CBC解密（不去除填充），优先使用cryptography后端"""
+    if CRYPTOGRAPHY_AVAILABLE:
+        decryptor = Cipher(algorithms.AES(key), modes.CBC(iv)).decryptor()
+        return decryptor.update(data) + decryptor.finalize()
+    return AES.new(key, AES.MODE_CBC, iv).decrypt(data)
+
+
+# EncodingAESKey解码结果缓存（key -> (aes_key, iv)），URL验证时无需每次重新Base64解码
+_AES_KEY_CACHE: dict[str, tuple[bytes, bytes]] = {}
+
+
+def _decode_aes_key(encoding_aes_key: str) -> tuple[bytes, bytes]:
+    """Base64解码EncodingAESKey（43位字符补齐'='到44位），返回(aes_key, iv)，结果按key缓存"""
+    cached = _AES_KEY_CACHE.get(encoding_aes_key)
+    if cached is None:
+        aes_key = base64.b64decode(encoding_aes_key + '=')
+        if len(aes_key) != 32:
+            raise ValueError(f"EncodingAESKey长度不正确: {len(aes_key)} 字节（应为32字节）")
+        # IV是EncodingAESKey的前16字节
+        cached = _AES_KEY_CACHE[encoding_aes_key] = (aes_key, aes_key[:16])
+    return cached
+
+
 def decrypt_echostr(encoding_aes_key: str, echostr: str, corp_id: str) -> str:
     """
     解密企业微信的echostr（使用EncodingAESKey）
@@ -958,74 +1291,45 @@ def decrypt_echostr(encoding_aes_key: str, echostr: str, corp_id: str) -> str:
         解密后的echostr
     
     Raises:
-        ImportError: 如果pycryptodome未安装
+        ImportError: 如果cryptography和pycryptodome均未安装
         ValueError: 如果解密失败或corp_id不匹配
     """
     if not AES_AVAILABLE:
-        raise ImportError("pycryptodome未安装，无法进行AES解密。请运行: pip install pycryptodome")
+        raise ImportError("cryptography和pycryptodome均未安装，无法进行AES解密。请运行: pip install cryptography")
     
     try:
         # 1. Base64解码EncodingAESKey并添加'='补齐（43位字符补齐到44位）
-        aes_key = base64.b64decode(encoding_aes_key + '=')
-        if len(aes_key) != 32:
-            raise ValueError(f"EncodingAESKey长度不正确: {len(aes_key)} 字节（应为32字节）")
-        
-        # IV是EncodingAESKey的前16字节
-        iv = aes_key[:16]
+        aes_key, iv = _decode_aes_key(encoding_aes_key)
         
         # 2. Base64解码echostr
         encrypted_msg = base64.b64decode(echostr)
         
         # 3. 使用AES-256-CBC解密（IV是密钥的前16字节，不是数据的前16字节）
-        cipher = AES.new(aes_key, AES.MODE_CBC, iv)
-        decrypted = cipher.decrypt(encrypted_msg)
+        decrypted = _aes_cbc_decrypt(aes_key, iv, encrypted_msg)
         
-        # 4. 去除PKCS7填充
-        pad = decrypted[-1]
+        # 4. 去除PKCS7填充（使用memoryview按偏移读取，避免逐段切片拷贝）
+        mv = memoryview(decrypted)
+        pad = mv[-1]
         if pad > 16 or pad < 1:
             raise ValueError(f"无效的填充值: {pad}")
         
         # 去除填充后的数据格式：随机16字节 + msg_len(4字节网络字节序) + msg + corp_id
-        content = decrypted[:-pad]
-        
-        # 5. 去掉前16字节的随机数
-        if len(content) < 16:
-            raise ValueError(f"消息内容太短: {len(content)} 字节")
-        
-        # content格式：msg_len(4字节) + msg + corp_id
-        content = content[16:]
-        
-        # 检查内容长度（至少要有4字节长度字段）
-        if len(content) < 4:
-            raise ValueError(f"消息内容太短: {len(content)} 字节")
+        # 5. 去掉前16字节的随机数，并检查内容长度（至少要有4字节长度字段）
+        if len(mv) - pad < 16 + 4:
+            raise ValueError(f"消息内容太短: {max(len(mv) - pad - 16, 0)} 字节")
+        body = mv[16:len(mv) - pad]
         
         # 6. 提取消息内容（格式：msg_len(4字节) + msg + corp_id）
         # 读取消息长度（网络字节序，大端）
-        # 添加调试信息
-        len_bytes = content[:4]
-        custom_print(f"解密调试: content长度={len(content)}, 长度字段hex={len_bytes.hex()}")
-        
-        # 尝试大端读取
-        msg_len = int.from_bytes(len_bytes, byteorder='big')
-        custom_print(f"大端读取msg_len={msg_len}")
-        
-        # 剩余内容应该是 msg + corp_id
-        remaining = content[4:]
-        custom_print(f"remaining长度={len(remaining)}")
-        
-        # 如果大端读取的长度不合理，尝试小端读取
-        if msg_len > len(remaining) or msg_len < 0:
-            msg_len_le = int.from_bytes(len_bytes, byteorder='little')
-            custom_print(f"大端读取失败，尝试小端读取: msg_len_le={msg_len_le}", error_msg=True)
-            if 0 <= msg_len_le <= len(remaining):
-                msg_len = msg_len_le
-                custom_print(f"使用小端读取的长度: {msg_len}")
-            else:
-                raise ValueError(f"消息长度解析失败: 大端={msg_len}, 小端={msg_len_le}, remaining={len(remaining)}")
+        msg_len = int.from_bytes(body[:4], byteorder='big')
+        if _DEBUG:
+            custom_print(f"解密调试: content长度={len(body)}, 长度字段hex={body[:4].hex()}, msg_len={msg_len}")
+        if msg_len > len(body) - 4:
+            raise ValueError(f"消息长度解析失败: msg_len={msg_len}, remaining={len(body) - 4}")
         
         # 提取消息和corp_id
-        msg = remaining[:msg_len].decode('utf-8')
-        received_corp_id = remaining[msg_len:].decode('utf-8')
+        msg = str(body[4:4 + msg_len], 'utf-8')
+        received_corp_id = str(body[4 + msg_len:], 'utf-8')
         
         # 7. 验证corp_id
         if received_corp_id != corp_id:
@@ -1057,19 +1361,21 @@ def verify_signature(token: str, timestamp: str, nonce: str, echostr: str, msg_s
     
     # 将token、timestamp、nonce、echostr按字典序排序（注意：字符串排序，不是数字排序）
     # 企业微信要求按字典序排序，然后将排序后的参数拼接成字符串
-    tmp_list = [token, timestamp, nonce, echostr]
-    tmp_list.sort()  # 字典序排序
-    tmp_str = ''.join(tmp_list)  # 拼接
+    # 每个参数只编码一次，按字节排序（UTF-8字节序与字符串码点序一致）后直接拼接
+    parts = sorted((token.encode('utf-8'), timestamp.encode('utf-8'),
+                    nonce.encode('utf-8'), echostr.encode('utf-8')))
     
     # SHA1加密
-    signature = hashlib.sha1(tmp_str.encode('utf-8')).hexdigest()
+    signature = hashlib.sha1(b''.join(parts)).hexdigest()
     
-    # 比较签名（不区分大小写，企业微信返回的签名是小写）
-    result = signature.lower() == msg_signature.lower()
+    # 比较签名（不区分大小写，企业微信返回的签名是小写；使用常量时间比较避免时序侧信道）
+    result = hmac.compare_digest(signature.encode('ascii'), msg_signature.lower().encode('utf-8'))
     
     if not result:
         custom_print(f"签名验证失败 - 计算得到的签名: {signature}, 期望的签名: {msg_signature}", error_msg=True)
-        custom_print(f"签名计算使用的字符串: {tmp_str[:200]}...", error_msg=True)
+    if not result and _DEBUG:
+        tmp_list = [p.decode('utf-8') for p in parts]
+        custom_print(f"签名计算使用的字符串: {''.join(tmp_list)[:200]}...", error_msg=True)
         custom_print(f"排序前的参数: token={token[:20]}..., timestamp={timestamp}, nonce={nonce}, echostr={echostr[:50]}...", error_msg=True)
         custom_print(f"排序后的顺序: {', '.join([f'{i}: {tmp_list[i][:30]}...' if len(tmp_list[i]) > 30 else f'{i}: {tmp_list[i]}' for i in range(len(tmp_list))])}", error_msg=True)
     
@@ -1096,22 +1402,23 @@ def parse_wechat_message(text: str, has_search_result: bool = False, is_search_m
         dict: 解析结果
     """
     text = text.strip()
+    text_lc = text.lower()
     
     # 设置Cookie
-    if text.lower().startswith('cookie:'):
+    if text_lc.startswith('cookie:'):
         cookie = text[7:].strip()
         return {'type': 'cookie', 'content': cookie}
     
     # 验证Cookie
-    if text.lower() in ['verify', '验证', '检查cookie']:
+    if text_lc in _VERIFY_CMDS:
         return {'type': 'verify', 'content': ''}
     
     # 帮助命令
-    if text.lower() in ['/help', 'help', '/帮助', '帮助']:
+    if text_lc in _HELP_CMDS:
         return {'type': 'help', 'content': ''}
     
     # 搜索模式: /search <关键词> 或 在搜索模式下直接输入关键词
-    if text.lower().startswith('/search'):
+    if text_lc.startswith('/search'):
         keyword = text[7:].strip()  # 去掉 "/search" 前缀
         if keyword:
             return {'type': 'search', 'content': keyword}
@@ -1120,21 +1427,21 @@ def parse_wechat_message(text: str, has_search_result: bool = False, is_search_m
     
     # 优先检查链接（即使处于搜索模式，链接也应该被优先识别）
     # 默认转存模式：检查是否有夸克网盘链接
-    url_pattern = r'https?://pan\.quark\.cn/s/[^\s\)]+'
-    urls = re.findall(url_pattern, text)
-    if urls:
-        # 如果包含链接，返回转存类型
-        if len(urls) == 1:
+    url_iter = _QUARK_URL_RE.finditer(text)
+    first = next(url_iter, None)
+    if first:
+        # 如果包含链接，返回转存类型；只需判断是否还有第二个链接，无需构建完整列表
+        if next(url_iter, None) is None:
             # 单个链接
-            return {'type': 'url', 'content': urls[0]}
+            return {'type': 'url', 'content': first.group(0)}
         else:
             # 多个链接
             return {'type': 'urls', 'content': text}
     
     # 检查翻页命令（仅当有搜索结果时，优先于数字检查）
-    if has_search_result and text.lower() in ['n', 'next', '下一页']:
+    if has_search_result and text_lc in _PAGE_NEXT_CMDS:
         return {'type': 'page_next', 'content': ''}
-    if has_search_result and text.lower() in ['p', 'prev', 'previous', '上一页']:
+    if has_search_result and text_lc in _PAGE_PREV_CMDS:
         return {'type': 'page_prev', 'content': ''}
     
     # 检查是否是数字（仅当有搜索结果时，才作为序号处理）
@@ -1144,21 +1451,149 @@ def parse_wechat_message(text: str, has_search_result: bool = False, is_search_m
     # 如果处于搜索模式，直接输入文本会被当作搜索关键词
     if is_search_mode and text and not text.startswith('/'):
         # 排除一些特殊命令
-        if text.lower() not in ['verify', '验证', '检查cookie', 'help', '/help', '/帮助', '帮助']:
+        if text_lc not in _VERIFY_CMDS and text_lc not in _HELP_CMDS:
             return {'type': 'search', 'content': text}
     
     # 如果没有链接，也没有其他匹配，可能是误输入
     return {'type': 'unknown', 'content': text}
 
 
+# 回调消息处理线程池：HTTP线程只负责读取请求并立即返回200，解密和XML解析（CPU工作）在此执行，业务处理交给后台事件循环
+_CALLBACK_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix='callback')
+
+# WXBizMsgCrypt实例缓存（按token、EncodingAESKey、corp_id），避免每个请求重新解析AES密钥
+_WXCPT_CACHE: dict[tuple[str, str, str], 'WXBizMsgCrypt'] = {}
+
+
+def _get_wxcpt(token: str, encoding_aes_key: str, corp_id: str) -> 'WXBizMsgCrypt':
+    """获取（或创建并缓存）WXBizMsgCrypt实例"""
+    key = (token, encoding_aes_key, corp_id)
+    wxcpt = _WXCPT_CACHE.get(key)
+    if wxcpt is None:
+        wxcpt = _WXCPT_CACHE[key] = WXBizMsgCrypt(token, encoding_aes_key, corp_id)
+    return wxcpt
+
+
+# 帮助信息（菜单点击和/help命令共用）
+_HELP_MSG = """📖 **使用说明**
+
+**1. 转存模式（默认）**
+   • 直接发送夸克网盘分享链接即可自动转存
+   • 支持单个链接：发送一个链接
+   • 支持批量链接：发送多个链接（保留原文格式）
+   • 默认只转存，不生成分享链接
+
+**2. 转存分享模式**
+   • 点击菜单栏"转存分享"按钮进入转存分享模式
+   • 在此模式下，转存后会自动生成新的分享链接
+   • 批量转存时会保留原文结构，并用新链接替换原链接
+
+**3. 搜索模式**
+   • 点击菜单栏"搜索"按钮进入搜索模式
+   • 或使用命令：`/search <关键词>`
+   • 在搜索模式下，直接输入关键词即可搜索
+   • 搜索结果会显示列表，输入序号（1-20）即可生成分享链接
+
+**4. 其他命令**
+   • `cookie: <cookie内容>` - 设置Cookie
+   • `verify` - 验证Cookie是否有效
+   • `/help` - 显示此帮助信息
+
+**使用示例：**
+1. 转存单个文件：直接发送链接
+2. 批量转存：发送包含多个链接的文本
+3. 搜索文件：点击"搜索"菜单，然后输入关键词
+4. 生成链接：搜索后输入数字 `1`、`2` 等"""
+
+# 固定提示文本
+_TRANSFER_SHARE_WELCOME = "✅ 已进入转存分享模式\n\n发送夸克网盘链接将自动转存并生成分享链接\n\n提示：发送链接后会同时转存和分享"
+_SEARCH_WELCOME = "🔍 已进入搜索模式\n\n请输入要搜索的关键词，例如：视频、电影、文档等\n\n提示：输入 /help 查看完整帮助"
+_SEARCH_MODE_HINT = "🔍 您当前处于搜索模式\n\n请输入要搜索的关键词，例如：视频、电影、文档等\n\n提示：发送链接可退出搜索模式并转存文件"
+_UNKNOWN_PROMPT = (
+    "请输入以下格式之一：\n"
+    "1. 夸克网盘链接（单个或多个）- 自动转存\n"
+    "2. 点击菜单栏「搜索」按钮或输入 /search <关键词> - 搜索文件\n"
+    "3. 数字（在搜索后输入）- 选择序号生成链接\n"
+    "4. /help - 查看帮助"
+)
+
+# 回调XML中需要读取的字段
+_CALLBACK_FIELDS = frozenset({'MsgType', 'Content', 'FromUserName', 'Event', 'EventKey'})
+
+def _parse_callback_fields(data: bytes) -> dict[str, str]:
+    """
+    流式解析回调XML，只取出_CALLBACK_FIELDS中的字段
+    
+    只处理end事件，取值后立即清空节点，内存占用与XML大小无关
+    """
+    fields = {}
+    if LXML_AVAILABLE:
+        # lxml在C层按tag过滤，只有关心的节点会回到Python；禁用实体解析和网络访问
+        events = lxml_etree.iterparse(io.BytesIO(data), events=('end',), tag=_CALLBACK_FIELDS,
+                                      resolve_entities=False, no_network=True, huge_tree=False)
+    else:
+        events = ET.iterparse(io.BytesIO(data), events=('end',))
+    for _, elem in events:
+        if elem.tag in _CALLBACK_FIELDS:
+            fields[elem.tag] = elem.text or ''
+        elem.clear()
+    return fields
+
+
+# 直接访问回调URL时返回的提示页面
+_CALLBACK_INFO_HTML = """<html><head><meta charset="utf-8"><title>企业微信回调接口</title></head><body>
+<h2>企业微信应用回调接口</h2>
+<p>此接口用于接收企业微信的消息推送。</p>
+<p>请在企业微信管理后台配置此URL：<code>http://your-server:8888/wechat/callback</code></p>
+<p>状态：✅ 服务运行正常</p>
+</body></html>""".encode('utf-8')
+
+# 固定内容的JSON响应体，启动时序列化一次
+_HEALTH_OK_BODY = _json_bytes({'status': 'ok'})
+_NOT_FOUND_BODY = _json_bytes({'error': '接口不存在'})
+
+
+# 回调应答（空的文本消息XML）
+_ACK_BODY = b'<xml><MsgType><![CDATA[text]]></MsgType><Content><![CDATA[]]></Content></xml>'
+
+
+@functools.lru_cache(maxsize=1)
+def _ack_response(second: int) -> bytes:
+    """回调应答的完整HTTP响应字节串（只有Date头随时间变化，按秒缓存）"""
+    return (
+        f"{BaseHTTPRequestHandler.protocol_version} 200 OK\r\n"
+        f"Server: {BaseHTTPRequestHandler.server_version} {BaseHTTPRequestHandler.sys_version}\r\n"
+        f"Date: {formatdate(second, usegmt=True)}\r\n"
+        f"Content-Type: text/xml\r\n"
+        f"Content-Length: {len(_ACK_BODY)}\r\n"
+        f"\r\n"
+    ).encode('latin-1') + _ACK_BODY
+
+
 class AppHTTPHandler(BaseHTTPRequestHandler):
     """HTTP请求处理器（企业微信应用）"""
     
+    # 每个请求都会新建一个处理器实例：以下状态均为类级别，所有请求共享；
+    # 请求无关的常量（应答字节串、解析字段集合、正则、提示文本、分发表）放在模块或类级别，不在请求中创建
     app_handler: Optional[QuarkAppHandler] = None
+    # 后台事件循环（由WeChatAppServer创建并在独立线程中常驻运行），所有异步业务处理都提交到这里，
+    # 不再为每个请求新建/关闭事件循环，QuarkAppHandler中的协程、信号量和缓存都绑定在同一个循环上
+    bg_loop: Optional[asyncio.AbstractEventLoop] = None
     token: str = ''
     encoding_aes_key: str = ''
     corp_id: str = ''  # 企业ID，用于AES解密验证
-    processing_messages: set[str] = set()  # 正在处理的消息（用于防止重复处理）
+    # 消息去重缓存：消息去重键 -> 过期时间（按插入顺序排列，容量和时间均有上限，避免无限增长）
+    processing_messages: OrderedDict[int, float] = OrderedDict()
+    processing_expiry: list[tuple[float, int]] = []  # (过期时间, 去重键)小顶堆，按过期时间精确淘汰
+    processing_lock = threading.Lock()  # 保护processing_messages和processing_expiry（回调在工作线程池中并发处理）
+    DEDUP_MAXSIZE = 4096  # 去重缓存最大条目数（过期堆最多保留其2倍记录）
+    DEDUP_PROCESSING_TTL = 300.0  # 处理中的消息最长保留时间（秒）
+    DEDUP_WINDOW = 10.0  # 处理完成后继续去重的时间窗口（秒），覆盖企业微信的重试间隔
+    # 去重布隆过滤器（2^16位，取去重键的两段16位作为位置）：新消息绝大多数在此直接判定为未出现过，
+    # 无需查字典；只会误报不会漏报，插入数达到DEDUP_MAXSIZE时按当前条目重建，清除已淘汰的键
+    dedup_bloom = bytearray(1 << 13)
+    dedup_bloom_inserts = 0
+    
     def do_GET(self):
         """处理GET请求（URL验证）"""
         parsed_path = urlparse(self.path)
@@ -1212,12 +1647,12 @@ class AppHTTPHandler(BaseHTTPRequestHandler):
                 # 如果有EncodingAESKey，需要解密echostr
                 if self.encoding_aes_key:
                     if not AES_AVAILABLE:
-                        custom_print(f"错误：配置了EncodingAESKey但pycryptodome未安装", error_msg=True)
-                        custom_print(f"请运行: pip install pycryptodome", error_msg=True)
+                        custom_print(f"错误：配置了EncodingAESKey但cryptography和pycryptodome均未安装", error_msg=True)
+                        custom_print(f"请运行: pip install cryptography", error_msg=True)
                         self.send_response(500)
                         self.send_header('Content-Type', 'text/plain')
                         self.end_headers()
-                        self.wfile.write(b'pycryptodome not installed')
+                        self.wfile.write(b'AES backend not installed')
                         return
                     
                     if not self.corp_id:
@@ -1254,23 +1689,14 @@ class AppHTTPHandler(BaseHTTPRequestHandler):
                     return
             else:
                 # 直接访问回调URL时返回提示信息
-                self.send_response(200)
-                self.send_header('Content-Type', 'text/html; charset=utf-8')
-                self.end_headers()
-                response = """<html><head><meta charset="utf-8"><title>企业微信回调接口</title></head><body>
-<h2>企业微信应用回调接口</h2>
-<p>此接口用于接收企业微信的消息推送。</p>
-<p>请在企业微信管理后台配置此URL：<code>http://your-server:8888/wechat/callback</code></p>
-<p>状态：✅ 服务运行正常</p>
-</body></html>"""
-                self.wfile.write(response.encode('utf-8'))
+                self._send_bytes(200, 'text/html; charset=utf-8', _CALLBACK_INFO_HTML)
                 custom_print(f"访问回调URL（非验证请求）")
                 return
         
         if path == '/health':
-            self._send_response(200, {'status': 'ok'})
+            self._send_response(200, _HEALTH_OK_BODY)
         else:
-            self._send_response(404, {'error': '接口不存在'})
+            self._send_response(404, _NOT_FOUND_BODY)
     
     def do_POST(self):
         """处理POST请求（接收消息）"""
@@ -1283,170 +1709,266 @@ class AppHTTPHandler(BaseHTTPRequestHandler):
                 # 接收企业微信消息
                 content_length = int(self.headers.get('Content-Length', 0))
                 post_data = self.rfile.read(content_length)
-                post_data_str = post_data.decode('utf-8')
                 
-                try:
-                    # 获取URL参数
-                    msg_signature = query_params.get('msg_signature', [''])[0]
-                    timestamp = query_params.get('timestamp', [''])[0]
-                    nonce = query_params.get('nonce', [''])[0]
-                    
-                    xml_content = None
-                    
-                    # 如果配置了EncodingAESKey，需要解密消息
-                    if self.encoding_aes_key and self.token and self.corp_id:
-                        if not WXBIZ_MSG_CRYPT_AVAILABLE:
-                            custom_print("错误: 配置了EncodingAESKey但WXBizMsgCrypt3不可用", error_msg=True)
-                            self.send_response(500)
-                            self.send_header('Content-Type', 'text/plain')
-                            self.end_headers()
-                            self.wfile.write(b'WXBizMsgCrypt3 not available')
-                            return
-                        
-                        if not msg_signature or not timestamp or not nonce:
-                            custom_print(f"错误: 加密模式下缺少必要参数: msg_signature={bool(msg_signature)}, timestamp={bool(timestamp)}, nonce={bool(nonce)}", error_msg=True)
-                            self.send_response(400)
-                            self.send_header('Content-Type', 'text/plain')
-                            self.end_headers()
-                            self.wfile.write(b'Missing required parameters')
-                            return
-                        
-                        try:
-                            # 使用WXBizMsgCrypt解密消息
-                            # 清理corp_id，去除可能的空格和换行符
-                            corp_id_clean = self.corp_id.strip() if self.corp_id else ''
-                            custom_print(f"开始解密消息 - corp_id: '{corp_id_clean}' (长度: {len(corp_id_clean)})")
-                            custom_print(f"EncodingAESKey长度: {len(self.encoding_aes_key) if self.encoding_aes_key else 0}")
-                            
-                            wxcpt = WXBizMsgCrypt(self.token, self.encoding_aes_key, corp_id_clean)
-                            ret, xml_content = wxcpt.DecryptMsg(post_data_str, msg_signature, timestamp, nonce)
-                            
-                            if ret != 0:
-                                custom_print(f"解密消息失败，错误码: {ret}", error_msg=True)
-                                if ret == -40005:
-                                    custom_print(f"企业ID验证失败！", error_msg=True)
-                                    custom_print(f"配置的corp_id: '{corp_id_clean}' (长度: {len(corp_id_clean)})", error_msg=True)
-                                    custom_print(f"提示: 请检查以下几点：", error_msg=True)
-                                    custom_print(f"  1. 企业微信管理后台 -> 我的企业 -> 企业信息 -> 企业ID", error_msg=True)
-                                    custom_print(f"  2. 确保配置文件中的corp_id与企业微信后台显示的企业ID完全一致（包括大小写）", error_msg=True)
-                                    custom_print(f"  3. 检查是否有空格、换行符等隐藏字符", error_msg=True)
-                                    custom_print(f"  4. 如果企业ID正确，可能是EncodingAESKey配置错误", error_msg=True)
-                                self.send_response(200)  # 返回200避免企业微信重复推送
-                                self.send_header('Content-Type', 'text/xml')
-                                self.end_headers()
-                                return
-                            
-                            custom_print(f"消息解密成功")
-                            xml_content = xml_content.decode('utf-8')
-                        except Exception as e:
-                            custom_print(f"解密消息异常: {str(e)}", error_msg=True)
-                            import traceback
-                            custom_print(traceback.format_exc(), error_msg=True)
-                            self.send_response(200)  # 返回200避免企业微信重复推送
-                            self.send_header('Content-Type', 'text/xml')
-                            self.end_headers()
-                            return
-                    else:
-                        # 明文模式，直接解析XML
-                        xml_content = post_data_str
-                    
-                    # 解析XML消息
-                    root = ET.fromstring(xml_content)
-                    msg_type = root.find('MsgType').text if root.find('MsgType') is not None else ''
-                    content_elem = root.find('Content')
-                    content = content_elem.text if content_elem is not None and content_elem.text else ''
-                    from_user_elem = root.find('FromUserName')
-                    from_user = from_user_elem.text if from_user_elem is not None and from_user_elem.text else ''
-                    
-                    custom_print(f"收到消息 - 类型: {msg_type}, 用户: {from_user}, 内容: {content[:50]}")
-                    
-                    # 处理事件消息（菜单点击）
-                    if msg_type == 'event':
-                        event_elem = root.find('Event')
-                        event = event_elem.text if event_elem is not None else ''
-                        event_key_elem = root.find('EventKey')
-                        event_key = event_key_elem.text if event_key_elem is not None else ''
-                        
-                        custom_print(f"收到事件消息 - 事件类型: {event}, EventKey: {event_key}")
-                        
-                        # 处理菜单点击事件
-                        if event == 'click':
-                            # 先返回HTTP响应
-                            self.send_response(200)
-                            self.send_header('Content-Type', 'text/xml')
-                            self.end_headers()
-                            self.wfile.write(b'<xml><MsgType><![CDATA[text]]></MsgType><Content><![CDATA[]]></Content></xml>')
-                            self.wfile.flush()
-                            
-                            # 处理菜单点击
-                            loop = asyncio.new_event_loop()
-                            asyncio.set_event_loop(loop)
-                            loop.run_until_complete(self._handle_menu_click(event_key, from_user))
-                            loop.close()
-                            return
-                    
-                    # 只处理文本消息
-                    if msg_type != 'text':
-                        custom_print(f"忽略非文本消息: {msg_type}")
-                        self.send_response(200)
-                        self.send_header('Content-Type', 'text/xml')
+                # 获取URL参数
+                msg_signature = query_params.get('msg_signature', [''])[0]
+                timestamp = query_params.get('timestamp', [''])[0]
+                nonce = query_params.get('nonce', [''])[0]
+                
+                # 如果配置了EncodingAESKey，需要解密消息（先检查前置条件，解密本身放到工作线程）
+                if self.encoding_aes_key and self.token and self.corp_id:
+                    if not WXBIZ_MSG_CRYPT_AVAILABLE:
+                        custom_print("错误: 配置了EncodingAESKey但WXBizMsgCrypt3不可用", error_msg=True)
+                        self.send_response(500)
+                        self.send_header('Content-Type', 'text/plain')
                         self.end_headers()
+                        self.wfile.write(b'WXBizMsgCrypt3 not available')
                         return
                     
-                    # 简单的消息去重机制（防止企业微信重试导致重复处理）
-                    import hashlib
-                    message_hash = hashlib.md5(f"{from_user}:{content}".encode('utf-8')).hexdigest()
-                    if message_hash in AppHTTPHandler.processing_messages:
-                        custom_print(f"消息正在处理中，忽略重复请求: {content[:50]}...")
-                        self.send_response(200)
-                        self.send_header('Content-Type', 'text/xml')
+                    if not msg_signature or not timestamp or not nonce:
+                        custom_print(f"错误: 加密模式下缺少必要参数: msg_signature={bool(msg_signature)}, timestamp={bool(timestamp)}, nonce={bool(nonce)}", error_msg=True)
+                        self.send_response(400)
+                        self.send_header('Content-Type', 'text/plain')
                         self.end_headers()
-                        self.wfile.write(b'<xml><MsgType><![CDATA[text]]></MsgType><Content><![CDATA[]]></Content></xml>')
+                        self.wfile.write(b'Missing required parameters')
                         return
+                
+                # 先返回HTTP响应（避免企业微信超时重试导致重复推送）
+                # 企业微信要求在5秒内收到响应，否则会重试；解密、解析和处理都交给工作线程池
+                self._send_ack()
+                
+                _CALLBACK_POOL.submit(self._process_callback, post_data, msg_signature, timestamp, nonce)
+                
+            else:
+                self._send_response(404, _NOT_FOUND_BODY)
+        
+        except Exception as e:
+            custom_print(f"处理请求失败: {str(e)}", error_msg=True)
+            _log_exc()
+            self.send_response(200)  # 返回200避免企业微信重复推送
+            self.end_headers()
+    
+    def _process_callback(self, post_data: bytes, msg_signature: str, timestamp: str, nonce: str) -> None:
+        """在工作线程中解密、解析并处理企业微信回调消息（HTTP响应已在do_POST中返回）"""
+        try:
+            xml_content = None
+            
+            # 如果配置了EncodingAESKey，需要解密消息
+            if self.encoding_aes_key and self.token and self.corp_id:
+                try:
+                    # 使用WXBizMsgCrypt解密消息
+                    # 清理corp_id，去除可能的空格和换行符
+                    corp_id_clean = self.corp_id.strip() if self.corp_id else ''
+                    custom_print(f"开始解密消息 - corp_id: '{corp_id_clean}' (长度: {len(corp_id_clean)})")
+                    custom_print(f"EncodingAESKey长度: {len(self.encoding_aes_key) if self.encoding_aes_key else 0}")
                     
-                    # 标记消息为正在处理
-                    AppHTTPHandler.processing_messages.add(message_hash)
-                    
-                    # 先返回HTTP响应（避免企业微信超时重试导致重复推送）
-                    # 企业微信要求在5秒内收到响应，否则会重试
-                    self.send_response(200)
-                    self.send_header('Content-Type', 'text/xml')
-                    self.end_headers()
-                    self.wfile.write(b'<xml><MsgType><![CDATA[text]]></MsgType><Content><![CDATA[]]></Content></xml>')
-                    self.wfile.flush()  # 确保响应已发送
+                    wxcpt = _get_wxcpt(self.token, self.encoding_aes_key, corp_id_clean)
+                    ret, xml_content = wxcpt.DecryptMsg(post_data, msg_signature, timestamp, nonce)
                     
-                    # 然后在后台处理消息（响应已发送，企业微信不会再重试）
-                    try:
-                        loop = asyncio.new_event_loop()
-                        asyncio.set_event_loop(loop)
-                        loop.run_until_complete(self._handle_message(content, from_user))
-                        loop.close()
-                    finally:
-                        # 处理完成后，从处理列表中移除（延迟10秒，防止短时间内重复）
-                        import threading
-                        def remove_hash():
-                            import time
-                            time.sleep(10)
-                            AppHTTPHandler.processing_messages.discard(message_hash)
-                        threading.Thread(target=remove_hash, daemon=True).start()
+                    if ret != 0:
+                        custom_print(f"解密消息失败，错误码: {ret}", error_msg=True)
+                        if ret == -40005:
+                            custom_print(f"企业ID验证失败！", error_msg=True)
+                            custom_print(f"配置的corp_id: '{corp_id_clean}' (长度: {len(corp_id_clean)})", error_msg=True)
+                            custom_print(f"提示: 请检查以下几点：", error_msg=True)
+                            custom_print(f"  1. 企业微信管理后台 -> 我的企业 -> 企业信息 -> 企业ID", error_msg=True)
+                            custom_print(f"  2. 确保配置文件中的corp_id与企业微信后台显示的企业ID完全一致（包括大小写）", error_msg=True)
+                            custom_print(f"  3. 检查是否有空格、换行符等隐藏字符", error_msg=True)
+                            custom_print(f"  4. 如果企业ID正确，可能是EncodingAESKey配置错误", error_msg=True)
+                        return
                     
+                    custom_print(f"消息解密成功")
                 except Exception as e:
-                    custom_print(f"解析消息失败: {str(e)}", error_msg=True)
-                    import traceback
-                    custom_print(traceback.format_exc(), error_msg=True)
-                    self.send_response(200)  # 即使失败也返回200
-                    self.send_header('Content-Type', 'text/xml')
-                    self.end_headers()
-                    
+                    custom_print(f"解密消息异常: {str(e)}", error_msg=True)
+                    _log_exc()
+                    return
             else:
-                self._send_response(404, {'error': '接口不存在'})
+                # 明文模式，直接解析请求体
+                xml_content = post_data
+            
+            # 解析XML消息（解密结果和请求体都是UTF-8字节，直接交给解析器，lxml不接受带编码声明的str）
+            fields = _parse_callback_fields(xml_content)
+            msg_type = fields.get('MsgType', '')
+            
+            # 只处理文本消息和事件消息，其他类型尽早返回
+            if msg_type != 'text' and msg_type != 'event':
+                custom_print(f"忽略非文本消息: {msg_type}")
+                return
+            
+            from_user = fields.get('FromUserName', '')
+            
+            # 处理事件消息（菜单点击），事件消息没有Content
+            if msg_type == 'event':
+                event = fields.get('Event', '')
+                event_key = fields.get('EventKey', '')
+                
+                custom_print(f"收到事件消息 - 用户: {from_user}, 事件类型: {event}, EventKey: {event_key}")
+                
+                # 处理菜单点击事件
+                if event == 'click':
+                    # 处理菜单点击（交给后台事件循环，工作线程立即释放）
+                    self._submit(self._handle_menu_click(event_key, from_user))
+                else:
+                    custom_print(f"忽略非菜单点击事件: {event}")
+                return
+            
+            content = fields.get('Content', '')
+            custom_print(f"收到消息 - 类型: {msg_type}, 用户: {from_user}, 内容: {content[:50]}")
+            
+            # 简单的消息去重机制（防止企业微信重试导致重复处理）
+            message_hash = _message_key(from_user, content)
+            if not self._mark_processing(message_hash):
+                custom_print(f"消息正在处理中，忽略重复请求: {content[:50]}...")
+                return
+            
+            # 处理消息（响应已在do_POST中发送，企业微信不会再重试），交给后台事件循环执行
+            future = self._submit(self._handle_message(content, from_user))
+            # 处理完成后，继续保留一个短时间窗口（防止短时间内重复），到期后自动淘汰
+            future.add_done_callback(lambda _: self._finish_processing(message_hash))
         
         except Exception as e:
-            custom_print(f"处理请求失败: {str(e)}", error_msg=True)
-            import traceback
-            custom_print(traceback.format_exc(), error_msg=True)
-            self.send_response(200)  # 返回200避免企业微信重复推送
-            self.end_headers()
+            custom_print(f"解析消息失败: {str(e)}", error_msg=True)
+            _log_exc()
+    
+    def _submit(self, coro) -> Future:
+        """将协程提交到后台事件循环执行（线程安全，不等待结果），返回concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.bg_loop)
+    
+    @classmethod
+    def _mark_processing(cls, message_hash: int) -> bool:
+        """
+        将消息标记为正在处理（多个工作线程并发处理，检查与标记需要原子化）
+        
+        Returns:
+            bool: 标记成功返回True；消息已在去重窗口内返回False
+        """
+        now = time.monotonic()
+        with cls.processing_lock:
+            messages = cls.processing_messages
+            expiry = cls.processing_expiry
+            # 从堆顶弹出已过期的条目（堆中过期时间与当前值不一致的是已被更新的旧记录，直接丢弃）
+            while expiry and expiry[0][0] <= now:
+                expires_at, key = heapq.heappop(expiry)
+                if messages.get(key) == expires_at:
+                    del messages[key]
+            # 限制最大容量（淘汰最早插入的条目）
+            while len(messages) >= cls.DEDUP_MAXSIZE:
+                messages.popitem(last=False)
+            # 按容量淘汰或更新过期时间都会在堆中留下旧记录，超过上限时按当前条目重建，保证内存有界
+            if len(expiry) >= 2 * cls.DEDUP_MAXSIZE:
+                expiry[:] = [(expires_at, key) for key, expires_at in messages.items()]
+                heapq.heapify(expiry)
+            # 布隆过滤器判定未出现过的一定是新消息，跳过字典查找
+            bloom = cls.dedup_bloom
+            b1 = message_hash & 0xFFFF
+            b2 = (message_hash >> 16) & 0xFFFF
+            if bloom[b1 >> 3] & (1 << (b1 & 7)) and bloom[b2 >> 3] & (1 << (b2 & 7)) and message_hash in messages:
+                return False
+            expires_at = now + cls.DEDUP_PROCESSING_TTL
+            messages[message_hash] = expires_at
+            heapq.heappush(expiry, (expires_at, message_hash))
+            cls.dedup_bloom_inserts += 1
+            if cls.dedup_bloom_inserts >= cls.DEDUP_MAXSIZE:
+                cls._rebuild_bloom()
+            else:
+                bloom[b1 >> 3] |= 1 << (b1 & 7)
+                bloom[b2 >> 3] |= 1 << (b2 & 7)
+            return True
+    
+    @classmethod
+    def _rebuild_bloom(cls) -> None:
+        """按当前去重缓存中的条目重建布隆过滤器（调用方需持有processing_lock）"""
+        bloom = cls.dedup_bloom
+        bloom[:] = bytes(len(bloom))
+        for key in cls.processing_messages:
+            b1 = key & 0xFFFF
+            b2 = (key >> 16) & 0xFFFF
+            bloom[b1 >> 3] |= 1 << (b1 & 7)
+            bloom[b2 >> 3] |= 1 << (b2 & 7)
+        cls.dedup_bloom_inserts = 0
+    
+    @classmethod
+    def _finish_processing(cls, message_hash: int) -> None:
+        """消息处理完成，将过期时间缩短为去重窗口"""
+        with cls.processing_lock:
+            if message_hash in cls.processing_messages:
+                expires_at = time.monotonic() + cls.DEDUP_WINDOW
+                cls.processing_messages[message_hash] = expires_at
+                heapq.heappush(cls.processing_expiry, (expires_at, message_hash))
+    
+    async def _menu_transfer_share(self, user_key: str, from_user: str):
+        """点击转存分享菜单，进入转存分享模式"""
+        self.app_handler.user_transfer_share_mode[user_key] = True
+        custom_print(f"用户 {user_key} 进入转存分享模式")
+        await self.app_handler.app.send_info("转存分享模式", _TRANSFER_SHARE_WELCOME, touser=from_user)
+    
+    async def _menu_search(self, user_key: str, from_user: str):
+        """点击搜索菜单，进入搜索模式"""
+        self.app_handler.user_search_mode[user_key] = True
+        await self.app_handler.app.send_info("搜索模式", _SEARCH_WELCOME, touser=from_user)
+        custom_print(f"用户 {user_key} 进入搜索模式")
+    
+    async def _menu_help(self, user_key: str, from_user: str):
+        """点击帮助菜单"""
+        await self.app_handler.app.send_info("使用帮助", _HELP_MSG, touser=from_user)
+        # 退出所有模式
+        self.app_handler.user_search_mode[user_key] = False
+        self.app_handler.user_transfer_share_mode[user_key] = False
+    
+    async def _menu_verify(self, user_key: str, from_user: str):
+        """点击验证菜单"""
+        custom_print("执行：验证Cookie（来自菜单）")
+        await self.app_handler.verify_cookie(touser=from_user)
+    
+    async def _menu_add_ban(self, user_key: str, from_user: str):
+        """添加屏蔽词"""
+        self.app_handler.user_waiting_ban_input[user_key] = True
+        current_ban = ",".join(self.app_handler.banned_keywords) if self.app_handler.banned_keywords else "无"
+        await self.app_handler.app.send_info(
+            "添加屏蔽词",
+            f"请输入屏蔽词，多个用英文逗号分隔，例如：词1,词2\n\n当前屏蔽词：{current_ban}",
+            touser=from_user
+        )
+        custom_print(f"用户 {user_key} 准备添加屏蔽词")
+    
+    async def _menu_scan_ban(self, user_key: str, from_user: str):
+        """手动扫描最近转存目录"""
+        try:
+            result = await self.app_handler.manager.scan_recent_folders_for_banned()
+            folders = result.get("folders") or []
+            scanned = result.get("scanned") or 0
+            matched = result.get("matched") or 0
+            deleted = result.get("deleted") or 0
+            if deleted:
+                # 扫描删除的文件可能位于任意已缓存的文件夹中
+                self.app_handler.invalidate_listing_cache()
+            parts = [
+                "已执行屏蔽词扫描（最近转存目录）",
+                f"扫描目录数：{len(folders)}",
+                f"扫描文件/文件夹数：{scanned}",
+                f"匹配屏蔽词：{matched}",
+                f"删除数量：{deleted}",
+            ]
+            if folders:
+                parts.append("目录ID：")
+                parts.extend(folders[:10])
+                if len(folders) > 10:
+                    parts.append("...")
+            msg = "\n".join(parts)
+            await self.app_handler.app.send_success("扫描完成", msg, touser=from_user)
+        except Exception as e:
+            await self.app_handler.app.send_error("扫描失败", str(e), touser=from_user)
+        custom_print(f"用户 {user_key} 手动触发屏蔽扫描")
+    
+    # 菜单事件分发表（key去掉开头的'/'，兼容两种写法）
+    _MENU_HANDLERS = {
+        'transfer_share': _menu_transfer_share,
+        'search': _menu_search,
+        'help': _menu_help,
+        'verify': _menu_verify,
+        'add_ban': _menu_add_ban,
+        'scan_ban': _menu_scan_ban,
+    }
     
     async def _handle_menu_click(self, event_key: str, from_user: str):
         """处理菜单点击事件"""
@@ -1457,92 +1979,114 @@ class AppHTTPHandler(BaseHTTPRequestHandler):
         try:
             user_key = from_user if from_user else 'default'
             
-            if event_key == '/transfer_share' or event_key == 'transfer_share':
-                # 点击转存分享菜单，进入转存分享模式
-                self.app_handler.user_transfer_share_mode[user_key] = True
-                custom_print(f"用户 {user_key} 进入转存分享模式，当前状态: {self.app_handler.user_transfer_share_mode}")
-                self.app_handler.app.send_info("转存分享模式", "✅ 已进入转存分享模式\n\n发送夸克网盘链接将自动转存并生成分享链接\n\n提示：发送链接后会同时转存和分享", touser=from_user)
-            elif event_key == '/search' or event_key == 'search':
-                # 点击搜索菜单，进入搜索模式
-                self.app_handler.user_search_mode[user_key] = True
-                self.app_handler.app.send_info("搜索模式", "🔍 已进入搜索模式\n\n请输入要搜索的关键词，例如：视频、电影、文档等\n\n提示：输入 /help 查看完整帮助", touser=from_user)
-                custom_print(f"用户 {user_key} 进入搜索模式")
-            elif event_key == '/help' or event_key == 'help':
-                # 点击帮助菜单
-                help_msg = """📖 **使用说明**
-
-**1. 转存模式（默认）**
-   • 直接发送夸克网盘分享链接即可自动转存
-   • 支持单个链接：发送一个链接
-   • 支持批量链接：发送多个链接（保留原文格式）
-   • 默认只转存，不生成分享链接
-
-**2. 转存分享模式**
-   • 点击菜单栏"转存分享"按钮进入转存分享模式
-   • 在此模式下，转存后会自动生成新的分享链接
-   • 批量转存时会保留原文结构，并用新链接替换原链接
-
-**3. 搜索模式**
-   • 点击菜单栏"搜索"按钮进入搜索模式
-   • 或使用命令：`/search <关键词>`
-   • 在搜索模式下，直接输入关键词即可搜索
-   • 搜索结果会显示列表，输入序号（1-20）即可生成分享链接
-
-**4. 其他命令**
-   • `cookie: <cookie内容>` - 设置Cookie
-   • `verify` - 验证Cookie是否有效
-   • `/help` - 显示此帮助信息
-
-**使用示例：**
-1. 转存单个文件：直接发送链接
-2. 批量转存：发送包含多个链接的文本
-3. 搜索文件：点击"搜索"菜单，然后输入关键词
-4. 生成链接：搜索后输入数字 `1`、`2` 等"""
-                self.app_handler.app.send_info("使用帮助", help_msg, touser=from_user)
-                # 退出所有模式
-                self.app_handler.user_search_mode[user_key] = False
-                self.app_handler.user_transfer_share_mode[user_key] = False
-            elif event_key == 'verify':
-                # 点击验证菜单
-                custom_print("执行：验证Cookie（来自菜单）")
-                await self.app_handler.verify_cookie(touser=from_user)
-            elif event_key == '/add_ban':
-                # 添加屏蔽词
-                self.app_handler.user_waiting_ban_input[user_key] = True
-                current_ban = ",".join(self.app_handler.banned_keywords) if self.app_handler.banned_keywords else "无"
-                self.app_handler.app.send_info(
-                    "添加屏蔽词",
-                    f"请输入屏蔽词，多个用英文逗号分隔，例如：词1,词2\n\n当前屏蔽词：{current_ban}",
-                    touser=from_user
-                )
-                custom_print(f"用户 {user_key} 准备添加屏蔽词")
-            elif event_key == '/scan_ban':
-                # 手动扫描最近转存目录
-                try:
-                    result = await self.app_handler.manager.scan_recent_folders_for_banned()
-                    folders = result.get("folders") or []
-                    scanned = result.get("scanned") or 0
-                    matched = result.get("matched") or 0
-                    deleted = result.get("deleted") or 0
-                    msg = "已执行屏蔽词扫描（最近转存目录）\n"
-                    msg += f"扫描目录数：{len(folders)}\n"
-                    msg += f"扫描文件/文件夹数：{scanned}\n"
-                    msg += f"匹配屏蔽词：{matched}\n"
-                    msg += f"删除数量：{deleted}\n"
-                    if folders:
-                        msg += "目录ID：\n" + "\n".join(folders[:10])
-                        if len(folders) > 10:
-                            msg += "\n..."
-                    self.app_handler.app.send_success("扫描完成", msg, touser=from_user)
-                except Exception as e:
-                    self.app_handler.app.send_error("扫描失败", str(e), touser=from_user)
-                custom_print(f"用户 {user_key} 手动触发屏蔽扫描")
+            handler = self._MENU_HANDLERS.get(event_key.lstrip('/'))
+            if handler:
+                await handler(self, user_key, from_user)
             else:
                 custom_print(f"未知的菜单事件: {event_key}")
         except Exception as e:
             custom_print(f"处理菜单点击失败: {str(e)}", error_msg=True)
-            import traceback
-            custom_print(traceback.format_exc(), error_msg=True)
+            _log_exc()
+    
+    async def _msg_cookie(self, user_key: str, from_user: str, msg_content, content: str, is_search_mode: bool):
+        """设置Cookie"""
+        custom_print("执行：设置Cookie")
+        await self.app_handler.set_cookie(msg_content, touser=from_user)
+    
+    async def _msg_verify(self, user_key: str, from_user: str, msg_content, content: str, is_search_mode: bool):
+        """验证Cookie"""
+        custom_print("执行：验证Cookie")
+        await self.app_handler.verify_cookie(touser=from_user)
+    
+    async def _msg_help(self, user_key: str, from_user: str, msg_content, content: str, is_search_mode: bool):
+        """显示帮助"""
+        custom_print("执行：显示帮助")
+        # 显示帮助信息
+        await self.app_handler.app.send_info("使用帮助", _HELP_MSG, touser=from_user)
+    
+    async def _msg_search(self, user_key: str, from_user: str, msg_content, content: str, is_search_mode: bool):
+        """搜索模式：/search <关键词> 或 在搜索模式下直接输入关键词"""
+        custom_print(f"执行：搜索文件 - 关键词: {msg_content}")
+        folder_id = self.app_handler.search_folder_id
+        # 执行搜索后，自动退出搜索模式
+        await self.app_handler.search_files(folder_id, msg_content, touser=from_user)
+        self.app_handler.user_search_mode[user_key] = False
+    
+    async def _msg_page_next(self, user_key: str, from_user: str, msg_content, content: str, is_search_mode: bool):
+        """翻到下一页"""
+        custom_print(f"执行：翻到下一页")
+        search_result = self.app_handler.user_search_results.get(user_key)
+        if search_result:
+            current_page = search_result.get('current_page', 1)
+            if current_page < search_result['total_pages']:
+                await self.app_handler._display_search_results_page(user_key, current_page + 1, touser=from_user)
+            else:
+                await self.app_handler.app.send_info("提示", "已经是最后一页了", touser=from_user)
+        else:
+            await self.app_handler.app.send_error("错误", "没有可用的搜索结果", touser=from_user)
+    
+    async def _msg_page_prev(self, user_key: str, from_user: str, msg_content, content: str, is_search_mode: bool):
+        """翻到上一页"""
+        custom_print(f"执行：翻到上一页")
+        search_result = self.app_handler.user_search_results.get(user_key)
+        if search_result:
+            current_page = search_result.get('current_page', 1)
+            if current_page > 1:
+                await self.app_handler._display_search_results_page(user_key, current_page - 1, touser=from_user)
+            else:
+                await self.app_handler.app.send_info("提示", "已经是第一页了", touser=from_user)
+        else:
+            await self.app_handler.app.send_error("错误", "没有可用的搜索结果", touser=from_user)
+    
+    async def _msg_select(self, user_key: str, from_user: str, msg_content, content: str, is_search_mode: bool):
+        """从搜索结果中选择序号"""
+        custom_print(f"执行：选择序号 - 序号: {msg_content}")
+        # 选择序号后，自动退出搜索模式（保留搜索结果，用户再次输入数字仍可选择）
+        await self.app_handler.create_share_from_search(msg_content, touser=from_user)
+        self.app_handler.user_search_mode[user_key] = False
+    
+    async def _msg_url(self, user_key: str, from_user: str, msg_content, content: str, is_search_mode: bool):
+        """单个链接转存"""
+        custom_print(f"执行：转存单个链接 - URL: {msg_content[:50]}")
+        # 转存链接时，退出搜索模式
+        self.app_handler.user_search_mode[user_key] = False
+        # 传递原始文本以保留原文章结构（在转存分享模式下）
+        await self.app_handler.process_share_url(msg_content, original_text=content, touser=from_user)
+    
+    async def _msg_urls(self, user_key: str, from_user: str, msg_content, content: str, is_search_mode: bool):
+        """多个链接批量转存"""
+        custom_print(f"执行：批量转存链接 - 内容长度: {len(msg_content)}")
+        # 转存链接时，退出搜索模式
+        self.app_handler.user_search_mode[user_key] = False
+        await self.app_handler.process_text_with_links(msg_content, touser=from_user)
+    
+    async def _msg_error(self, user_key: str, from_user: str, msg_content, content: str, is_search_mode: bool):
+        """错误消息"""
+        custom_print(f"输入错误: {msg_content}")
+        await self.app_handler.app.send_error("输入错误", msg_content, touser=from_user)
+    
+    async def _msg_unknown(self, user_key: str, from_user: str, msg_content, content: str, is_search_mode: bool):
+        """未知消息类型（可能是误输入，提示用户）"""
+        custom_print(f"未知消息类型: {content[:50]}")
+        # 如果处于搜索模式，提示用户输入关键词
+        if is_search_mode:
+            await self.app_handler.app.send_info("提示", _SEARCH_MODE_HINT, touser=from_user)
+        else:
+            await self.app_handler.app.send_info("提示", _UNKNOWN_PROMPT, touser=from_user)
+    
+    # 消息类型分发表（parse_wechat_message返回的type -> 处理函数，未命中的按未知消息处理）
+    _MSG_HANDLERS = {
+        'cookie': _msg_cookie,
+        'verify': _msg_verify,
+        'help': _msg_help,
+        'search': _msg_search,
+        'page_next': _msg_page_next,
+        'page_prev': _msg_page_prev,
+        'select': _msg_select,
+        'url': _msg_url,
+        'urls': _msg_urls,
+        'error': _msg_error,
+    }
     
     async def _handle_message(self, content: str, from_user: str):
         """处理用户消息（消息已经在do_POST中标记为已处理）"""
@@ -1554,12 +2098,12 @@ class AppHTTPHandler(BaseHTTPRequestHandler):
             user_key = from_user if from_user else 'default'
             # 若等待输入屏蔽词，优先处理
             if self.app_handler.user_waiting_ban_input.get(user_key, False):
-                keywords = [k.strip() for k in content.replace("，", ",").split(",") if k.strip()]
+                keywords = [k for k in _BAN_SPLIT_RE.split(content.strip()) if k]
                 if keywords:
                     self.app_handler._update_banned_keywords(keywords)
-                    self.app_handler.app.send_success("添加屏蔽词成功", "已加入屏蔽词：" + ",".join(keywords), touser=from_user)
+                    await self.app_handler.app.send_success("添加屏蔽词成功", "已加入屏蔽词：" + ",".join(keywords), touser=from_user)
                 else:
-                    self.app_handler.app.send_warning("添加屏蔽词失败", "输入为空，请重新输入", touser=from_user)
+                    await self.app_handler.app.send_warning("添加屏蔽词失败", "输入为空，请重新输入", touser=from_user)
                 self.app_handler.user_waiting_ban_input[user_key] = False
                 return
 
@@ -1576,131 +2120,37 @@ class AppHTTPHandler(BaseHTTPRequestHandler):
             msg_content = parsed['content']
             custom_print(f"消息解析结果 - 类型: {msg_type}, 内容: {str(msg_content)[:100]}")
             
-            if msg_type == 'cookie':
-                custom_print("执行：设置Cookie")
-                await self.app_handler.set_cookie(msg_content, touser=from_user)
-            elif msg_type == 'verify':
-                custom_print("执行：验证Cookie")
-                await self.app_handler.verify_cookie(touser=from_user)
-            elif msg_type == 'help':
-                custom_print("执行：显示帮助")
-                # 显示帮助信息
-                help_msg = """📖 **使用说明**
-
-**1. 转存模式（默认）**
-   • 直接发送夸克网盘分享链接即可自动转存
-   • 支持单个链接：发送一个链接
-   • 支持批量链接：发送多个链接（保留原文格式）
-   • 默认只转存，不生成分享链接
-
-**2. 转存分享模式**
-   • 点击菜单栏"转存分享"按钮进入转存分享模式
-   • 在此模式下，转存后会自动生成新的分享链接
-   • 批量转存时会保留原文结构，并用新链接替换原链接
-
-**3. 搜索模式**
-   • 点击菜单栏"搜索"按钮进入搜索模式
-   • 或使用命令：`/search <关键词>`
-   • 在搜索模式下，直接输入关键词即可搜索
-   • 搜索结果会显示列表，输入序号（1-20）即可生成分享链接
-
-**4. 其他命令**
-   • `cookie: <cookie内容>` - 设置Cookie
-   • `verify` - 验证Cookie是否有效
-   • `/help` - 显示此帮助信息
-
-**使用示例：**
-1. 转存单个文件：直接发送链接
-2. 批量转存：发送包含多个链接的文本
-3. 搜索文件：点击"搜索"菜单，然后输入关键词
-4. 生成链接：搜索后输入数字 `1`、`2` 等"""
-                self.app_handler.app.send_info("使用帮助", help_msg, touser=from_user)
-            elif msg_type == 'search':
-                # 搜索模式：/search <关键词> 或 在搜索模式下直接输入关键词
-                custom_print(f"执行：搜索文件 - 关键词: {msg_content}")
-                folder_id = self.app_handler.search_folder_id
-                # 执行搜索后，自动退出搜索模式
-                await self.app_handler.search_files(folder_id, msg_content, touser=from_user)
-                self.app_handler.user_search_mode[user_key] = False
-            elif msg_type == 'page_next':
-                # 翻到下一页
-                custom_print(f"执行：翻到下一页")
-                search_result = self.app_handler.user_search_results.get(user_key)
-                if search_result:
-                    current_page = search_result.get('current_page', 1)
-                    items = search_result.get('items', [])
-                    items_per_page = 7
-                    total_pages = (len(items) + items_per_page - 1) // items_per_page
-                    if current_page < total_pages:
-                        await self.app_handler._display_search_results_page(user_key, current_page + 1, touser=from_user)
-                    else:
-                        self.app_handler.app.send_info("提示", "已经是最后一页了", touser=from_user)
-                else:
-                    self.app_handler.app.send_error("错误", "没有可用的搜索结果", touser=from_user)
-            elif msg_type == 'page_prev':
-                # 翻到上一页
-                custom_print(f"执行：翻到上一页")
-                search_result = self.app_handler.user_search_results.get(user_key)
-                if search_result:
-                    current_page = search_result.get('current_page', 1)
-                    if current_page > 1:
-                        await self.app_handler._display_search_results_page(user_key, current_page - 1, touser=from_user)
-                    else:
-                        self.app_handler.app.send_info("提示", "已经是第一页了", touser=from_user)
-                else:
-                    self.app_handler.app.send_error("错误", "没有可用的搜索结果", touser=from_user)
-            elif msg_type == 'select':
-                # 从搜索结果中选择序号
-                custom_print(f"执行：选择序号 - 序号: {msg_content}")
-                # 选择序号后，自动退出搜索模式（保留搜索结果，用户再次输入数字仍可选择）
-                await self.app_handler.create_share_from_search(msg_content, touser=from_user)
-                self.app_handler.user_search_mode[user_key] = False
-            elif msg_type == 'url':
-                # 单个链接转存
-                custom_print(f"执行：转存单个链接 - URL: {msg_content[:50]}")
-                # 转存链接时，退出搜索模式
-                self.app_handler.user_search_mode[user_key] = False
-                # 传递原始文本以保留原文章结构（在转存分享模式下）
-                await self.app_handler.process_share_url(msg_content, original_text=content, touser=from_user)
-            elif msg_type == 'urls':
-                # 多个链接批量转存
-                custom_print(f"执行：批量转存链接 - 内容长度: {len(msg_content)}")
-                # 转存链接时，退出搜索模式
-                self.app_handler.user_search_mode[user_key] = False
-                await self.app_handler.process_text_with_links(msg_content, touser=from_user)
-            elif msg_type == 'error':
-                # 错误消息
-                custom_print(f"输入错误: {msg_content}")
-                self.app_handler.app.send_error("输入错误", msg_content, touser=from_user)
-            else:
-                # 未知消息类型（可能是误输入，提示用户）
-                custom_print(f"未知消息类型: {msg_type}, 内容: {content[:50]}")
-                # 如果处于搜索模式，提示用户输入关键词
-                if is_search_mode:
-                    self.app_handler.app.send_info("提示", 
-                        "🔍 您当前处于搜索模式\n\n请输入要搜索的关键词，例如：视频、电影、文档等\n\n提示：发送链接可退出搜索模式并转存文件", 
-                        touser=from_user)
-                else:
-                    self.app_handler.app.send_info("提示", 
-                        "请输入以下格式之一：\n"
-                        "1. 夸克网盘链接（单个或多个）- 自动转存\n"
-                        "2. 点击菜单栏「搜索」按钮或输入 /search <关键词> - 搜索文件\n"
-                        "3. 数字（在搜索后输入）- 选择序号生成链接\n"
-                        "4. /help - 查看帮助", 
-                        touser=from_user)
+            handler = self._MSG_HANDLERS.get(msg_type, AppHTTPHandler._msg_unknown)
+            await handler(self, user_key, from_user, msg_content, content, is_search_mode)
         except Exception as e:
             custom_print(f"处理消息失败: {str(e)}", error_msg=True)
-            import traceback
-            custom_print(traceback.format_exc(), error_msg=True)
-            self.app_handler.app.send_error("处理失败", f"处理消息时发生错误：{str(e)}", touser=from_user)
-    
-    def _send_response(self, status_code: int, data: dict):
-        """发送响应"""
-        self.send_response(status_code)
-        self.send_header('Content-Type', 'application/json; charset=utf-8')
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.end_headers()
-        self.wfile.write(json.dumps(data, ensure_ascii=False).encode('utf-8'))
+            _log_exc()
+            await self.app_handler.app.send_error("处理失败", f"处理消息时发生错误：{str(e)}", touser=from_user)
+    
+    def _send_ack(self):
+        """返回回调应答（整段响应预先拼好并按秒缓存，跳过逐个响应头的格式化，一次写出）"""
+        self.log_request(200)
+        self.wfile.write(_ack_response(int(time.time())))
+    
+    def _send_bytes(self, status_code: int, content_type: str, body: bytes, *extra_headers: tuple[str, str]):
+        """发送响应：状态行、响应头和响应体在本地拼接后一次写出（一次send调用，同_send_ack）"""
+        self.log_request(status_code)
+        reason = self.responses[status_code][0] if status_code in self.responses else ''
+        lines = [
+            f"{self.protocol_version} {status_code} {reason}",
+            f"Server: {self.version_string()}",
+            f"Date: {self.date_time_string()}",
+            f"Content-Type: {content_type}",
+            f"Content-Length: {len(body)}",
+        ]
+        lines.extend(f"{keyword}: {value}" for keyword, value in extra_headers)
+        lines.append("\r\n")
+        self.wfile.write("\r\n".join(lines).encode('latin-1', 'strict') + body)
+    
+    def _send_response(self, status_code: int, data):
+        """发送JSON响应（data为dict或已序列化的bytes）"""
+        body = data if isinstance(data, bytes) else _json_bytes(data)
+        self._send_bytes(status_code, 'application/json; charset=utf-8', body, ('Access-Control-Allow-Origin', '*'))
     
     def log_message(self, format, *args):
         """自定义日志输出"""
@@ -1744,6 +2194,10 @@ class WeChatAppServer:
             proxy=proxy, banned_keywords=banned_keywords, ad_fid=ad_fid
         )
         AppHTTPHandler.app_handler = self.app_handler
+        # 常驻后台事件循环，回调中的异步处理都提交到这个循环
+        self._bg_loop = uvloop.new_event_loop() if UVLOOP_AVAILABLE else asyncio.new_event_loop()
+        threading.Thread(target=self._bg_loop.run_forever, name='async-loop', daemon=True).start()
+        AppHTTPHandler.bg_loop = self._bg_loop
         AppHTTPHandler.token = token
         AppHTTPHandler.encoding_aes_key = encoding_aes_key
         AppHTTPHandler.corp_id = corp_id  # 设置企业ID，用于AES解密验证
@@ -1802,7 +2256,8 @@ class WeChatAppServer:
         Args:
             create_menu: 是否在启动时创建默认菜单
         """
-        server = HTTPServer((self.host, self.port), AppHTTPHandler)
+        # 多线程服务器：每个连接一个线程，请求接收与应答互不阻塞（线程只做读取、应答和提交任务）
+        server = ThreadingHTTPServer((self.host, self.port), AppHTTPHandler)
         custom_print(f"企业微信应用服务器启动成功")
         custom_print(f"监听地址: http://{self.host}:{self.port}")
         custom_print(f"回调URL: http://{self.host}:{self.port}/wechat/callback")
@@ -1819,11 +2274,10 @@ class WeChatAppServer:
         except KeyboardInterrupt:
             custom_print("服务器已停止")
             server.shutdown()
+            self._bg_loop.call_soon_threadsafe(self._bg_loop.stop)
 
 
 if __name__ == '__main__':
-    import sys
-    
     # 立即输出启动信息，确保调试信息能显示
     sys.stdout.flush()
     print("=" * 60, flush=True)
@@ -7,18 +7,116 @@ import json
 import os
 import random
 import re
-from typing import Any, Union, Optional, List
+import time
+from typing import Any, NamedTuple, Union, Optional, List
 
 import httpx
-from utils import custom_print, generate_random_code, get_datetime, get_timestamp, read_config, save_config
+from utils import custom_print, generate_random_code, get_datetime, get_timestamp, save_config
+
+# 尝试导入h2以启用HTTP/2（httpx[http2]，同一连接上多路复用请求；未安装时使用HTTP/1.1）
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# 尝试导入orjson用于解析接口响应（C实现，比标准库json更快；未安装时回退到标准库json）
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
 
 CONFIG_DIR = './config'
 os.makedirs(CONFIG_DIR, exist_ok=True)
 
+# 分享链接中的提取码和pwd_id（模块加载时预编译）
+_PWD_RE = re.compile(r'pwd=([^&#]*)')
+_PWD_ID_RE = re.compile(r'/s/([^/?#]+)')
+
+
+class ShareFile(NamedTuple):
+    """分享链接中的文件/文件夹（比dict更省内存，字段用属性访问）"""
+    fid: str
+    file_name: str
+    file_type: int
+    dir: bool
+    pdir_fid: str
+    include_items: Any
+    share_fid_token: str
+    status: int
+
+
+# 请求参数中的随机数（直接绑定randrange，省去randint的一层包装）
+_randrange = random.randrange
+
+# 夸克网盘接口的公共请求参数（预先构建为QueryParams，每次请求只合并变化的部分）
+_BASE_PARAMS = httpx.QueryParams({
+    'pr': 'ucpro',
+    'fr': 'pc',
+    'uc_param_str': '',
+})
+
+# 表示Cookie失效/未登录的接口错误码（如31001: require login [guest]）
+_AUTH_FAILED_CODES = frozenset({31001})
+
+# 获取分享详情时各分页相同的固定参数
+_DETAIL_BASE_PARAMS = {
+    'force': '0',
+    '_size': '50',
+    '_sort': 'file_type:asc,updated_at:desc',
+}
+
+
+def _loads(response: httpx.Response) -> Any:
+    """解析接口返回的JSON响应体"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(response.content)
+    return json.loads(response.content)
+
+
+# 已解析的配置文件：路径 -> (文件修改时间st_mtime_ns, 解析结果)，文件未修改时不再重复读取解析
+_config_cache: dict[str, tuple[int, Any]] = {}
+
+
+def _read_json_config(path: str) -> Any:
+    """读取JSON配置文件（按修改时间缓存解析结果）"""
+    mtime = os.stat(path).st_mtime_ns
+    cached = _config_cache.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    with open(path, 'rb') as f:
+        content = f.read()
+    data = orjson.loads(content) if ORJSON_AVAILABLE else json.loads(content)
+    _config_cache[path] = (mtime, data)
+    return data
+
+
+def _backoff_delay(attempt: int) -> float:
+    """轮询等待时间：从0.1秒开始指数增长，上限2秒，并加±20%抖动"""
+    return min(2.0, 0.1 * (1.6 ** attempt)) * (0.8 + 0.4 * random.random())
+
 
 class QuarkPanFileManager:
     """夸克网盘文件管理器（无浏览器登录版本）"""
     
+    # Cookie验证结果缓存有效期（秒）
+    COOKIE_CACHE_TTL = 60
+    # 获取分享详情时并发请求分页的最大数量
+    DETAIL_CONCURRENCY = 8
+    # 屏蔽词扫描时并发列出目录的最大数量
+    LIST_CONCURRENCY = 10
+    # 文件列表缓存默认有效期（秒，调用方可通过max_age放宽），缓存条目的最长保留时间（秒）与最大条目数
+    LIST_CACHE_TTL = 10
+    LIST_CACHE_MAX_AGE = 60
+    LIST_CACHE_SIZE = 1024
+    # 单次删除请求的最大文件数量
+    DELETE_CHUNK = 200
+    # 接口请求遇到网络错误或5xx时的最大尝试次数
+    API_RETRIES = 3
+    # 接口请求超时（在共用客户端上统一设置）
+    REQUEST_TIMEOUT = httpx.Timeout(60.0, connect=60.0)
+    
     def __init__(self, cookies: str = None, banned_keywords: Optional[List[str]] = None, ad_fid: str = '') -> None:
         """
         初始化文件管理器
@@ -30,12 +128,17 @@ class QuarkPanFileManager:
         self.user: Union[str, None] = '用户A'
         self.pdir_id: Union[str, None] = '0'
         self.dir_name: Union[str, None] = '根目录'
-        self.banned_keywords: List[str] = banned_keywords or []
-        # 去除空白的关键词
-        self.banned_keywords = [k.strip() for k in self.banned_keywords if k and k.strip()]
+        # 屏蔽词（赋值时去除空白并预编译匹配正则，见banned_keywords属性）
+        self.banned_keywords = banned_keywords
         self.ad_fid: str = ad_fid.strip() if ad_fid else ''
         # 最近转存的文件夹ID，最多保留5个
         self.recent_transfer_folders: List[str] = []
+        # Cookie验证结果缓存：(是否有效, 用户名, 过期时间)
+        self._cookie_cache: Optional[tuple[bool, str, float]] = None
+        # 文件列表缓存：(pdir_fid, page, size, sort, fetch_total) -> (缓存时间, 响应数据)；
+        # 每次失效时递增_list_cache_epoch，失效前发出的请求返回后不再写入缓存
+        self._list_cache: dict[tuple, tuple[float, dict]] = {}
+        self._list_cache_epoch = 0
         
         # 如果提供了cookies，使用提供的；否则从配置文件读取
         if cookies:
@@ -48,14 +151,49 @@ class QuarkPanFileManager:
         if not self.cookies:
             raise ValueError("Cookie不能为空，请先设置Cookie")
         
-        self.headers: dict[str, str] = {
+        headers = httpx.Headers({
             'user-agent': 'Mozilla/5.0 (Windows NT 10.0; WOW64) AppleWebKit/537.36 (KHTML, like Gecko)'
                           ' Chrome/94.0.4606.71 Safari/537.36 Core/1.94.225.400 QQBrowser/12.2.5544.400',
             'origin': 'https://pan.quark.cn',
             'referer': 'https://pan.quark.cn/',
             'accept-language': 'zh-CN,zh;q=0.9',
             'cookie': self.cookies,
-        }
+        })
+        # 所有接口共用一个长连接客户端，避免每次请求都重新建立TCP/TLS连接；
+        # 启用HTTP/2时httpx会在TLS握手中通过ALPN协商h2，并发的分页/目录请求复用同一连接。
+        # 传入transport后连接池参数要设置在transport上；连接失败的重试统一由_request负责（API_RETRIES），
+        # transport不再重试，避免两层重试叠加
+        self._client = httpx.AsyncClient(
+            headers=headers,
+            timeout=self.REQUEST_TIMEOUT,
+            transport=httpx.AsyncHTTPTransport(
+                http2=HTTP2_AVAILABLE,
+                limits=httpx.Limits(max_connections=200, max_keepalive_connections=50, keepalive_expiry=30.0),
+            ),
+        )
+        # 请求头只保存在客户端上，每次请求不再传入；self.headers与客户端共用同一个Headers对象
+        self.headers: httpx.Headers = self._client.headers
+    
+    async def aclose(self) -> None:
+        """关闭共用的HTTP客户端"""
+        await self._client.aclose()
+    
+    async def __aenter__(self) -> 'QuarkPanFileManager':
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.aclose()
+    
+    @property
+    def banned_keywords(self) -> List[str]:
+        return self._banned_keywords
+    
+    @banned_keywords.setter
+    def banned_keywords(self, keywords: Optional[List[str]]) -> None:
+        # 去除空白的关键词，并把所有关键词合并成一个忽略大小写的正则，匹配时只需扫描一遍文件名
+        self._banned_keywords: List[str] = [k.strip() for k in (keywords or []) if k and k.strip()]
+        self._banned_re = (re.compile('|'.join(map(re.escape, self._banned_keywords)), re.IGNORECASE)
+                           if self._banned_keywords else None)
     
     def load_cookies(self) -> str:
         """从配置文件加载Cookie"""
@@ -73,106 +211,134 @@ class QuarkPanFileManager:
     def update_cookies(self, cookies: str) -> None:
         """更新Cookie"""
         self.cookies = cookies
-        self.headers['cookie'] = cookies
+        self._client.headers['cookie'] = cookies
+        self._cookie_cache = None
         save_config(f'{CONFIG_DIR}/cookies.txt', cookies)
         custom_print("Cookie已更新")
     
-    async def verify_cookies(self) -> tuple[bool, str]:
+    async def verify_cookies(self, use_cache: bool = False) -> tuple[bool, str]:
         """
         验证Cookie是否有效
         
+        Args:
+            use_cache: 是否使用缓存的验证结果（仅缓存验证通过的结果，有效期COOKIE_CACHE_TTL秒）
+        
         Returns:
             tuple: (是否有效, 用户名或错误信息)
         """
+        if use_cache and self._cookie_cache and time.monotonic() < self._cookie_cache[2]:
+            return self._cookie_cache[0], self._cookie_cache[1]
+        
+        self._cookie_cache = None
         try:
             nickname = await self.get_user_info()
             if nickname:
+                self._cookie_cache = (True, nickname, time.monotonic() + self.COOKIE_CACHE_TTL)
                 return True, nickname
             else:
                 return False, "无法获取用户信息，Cookie可能已失效"
         except Exception as e:
             return False, f"Cookie验证失败: {str(e)}"
     
+    async def _request(self, method: str, url: str, params: Optional[dict] = None,
+                       data: Any = None, idempotent: bool = True) -> Any:
+        """
+        调用夸克网盘接口并解析JSON响应
+        
+        自动补充公共参数和随机参数__dt/__t。连接失败时按指数退避重试；其余网络错误或5xx响应
+        只对幂等请求重试，避免转存、创建文件夹等请求被重复提交。
+        返回401或登录失效错误码时清除Cookie验证缓存，下次验证会重新请求用户信息。
+        """
+        for attempt in range(self.API_RETRIES):
+            request_params = _BASE_PARAMS.merge(
+                {'__dt': _randrange(100, 10000), '__t': get_timestamp(13), **(params or {})}
+            )
+            last_attempt = attempt == self.API_RETRIES - 1
+            try:
+                response = await self._client.request(method, url, params=request_params, json=data)
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout):
+                # 请求尚未发出，任何请求都可以安全重试
+                if last_attempt:
+                    raise
+            except httpx.TransportError:
+                if not idempotent or last_attempt:
+                    raise
+            else:
+                if response.status_code < 500 or not idempotent or last_attempt:
+                    json_data = _loads(response)
+                    if response.status_code == 401 or (isinstance(json_data, dict)
+                                                       and json_data.get('code') in _AUTH_FAILED_CODES):
+                        self._cookie_cache = None
+                    return json_data
+            await asyncio.sleep(_backoff_delay(attempt + 3))
+    
+    async def _get(self, url: str, params: Optional[dict] = None) -> Any:
+        """GET请求夸克网盘接口"""
+        return await self._request('GET', url, params=params)
+    
+    async def _post(self, url: str, data: Any, params: Optional[dict] = None, idempotent: bool = False) -> Any:
+        """POST请求夸克网盘接口（默认视为非幂等，只在连接失败时重试）"""
+        return await self._request('POST', url, params=params, data=data, idempotent=idempotent)
+    
     @staticmethod
     def get_pwd_id(share_url: str) -> str:
         """从分享链接中提取pwd_id"""
-        return share_url.split('?')[0].split('/s/')[-1]
+        match = _PWD_ID_RE.search(share_url)
+        return match.group(1) if match else ''
     
     async def get_stoken(self, pwd_id: str, password: str = '') -> str:
         """获取分享页面的stoken"""
-        params = {
-            'pr': 'ucpro',
-            'fr': 'pc',
-            'uc_param_str': '',
-            '__dt': random.randint(100, 9999),
-            '__t': get_timestamp(13),
-        }
         api = "https://drive-pc.quark.cn/1/clouddrive/share/sharepage/token"
         data = {"pwd_id": pwd_id, "passcode": password}
-        async with httpx.AsyncClient() as client:
-            timeout = httpx.Timeout(60.0, connect=60.0)
-            response = await client.post(api, json=data, params=params, headers=self.headers, timeout=timeout)
-            json_data = response.json()
-            if json_data['status'] == 200 and json_data['data']:
-                stoken = json_data["data"]["stoken"]
-            else:
-                stoken = ''
-                custom_print(f"获取stoken失败，{json_data['message']}")
-            return stoken
-    
+        json_data = await self._post(api, data, idempotent=True)
+        if json_data['status'] == 200 and json_data['data']:
+            stoken = json_data["data"]["stoken"]
+        else:
+            stoken = ''
+            custom_print(f"获取stoken失败，{json_data['message']}")
+        return stoken
+
     async def get_detail(self, pwd_id: str, stoken: str, pdir_fid: str = '0') -> tuple:
-        """获取分享页面详情"""
+        """获取分享页面详情（先取第一页得到总数，其余分页并发获取）"""
         api = "https://drive-pc.quark.cn/1/clouddrive/share/sharepage/detail"
-        page = 1
-        file_list: list[dict[str, Union[int, str]]] = []
-        
-        async with httpx.AsyncClient() as client:
-            while True:
-                params = {
-                    'pr': 'ucpro',
-                    'fr': 'pc',
-                    'uc_param_str': '',
-                    "pwd_id": pwd_id,
-                    "stoken": stoken,
-                    'pdir_fid': pdir_fid,
-                    'force': '0',
-                    "_page": str(page),
-                    '_size': '50',
-                    '_sort': 'file_type:asc,updated_at:desc',
-                    '__dt': random.randint(200, 9999),
-                    '__t': get_timestamp(13),
-                }
-                
-                timeout = httpx.Timeout(60.0, connect=60.0)
-                response = await client.get(api, headers=self.headers, params=params, timeout=timeout)
-                json_data = response.json()
-                
-                is_owner = json_data['data']['is_owner']
-                _total = json_data['metadata']['_total']
-                if _total < 1:
-                    return is_owner, file_list
-                
-                _size = json_data['metadata']['_size']
-                _count = json_data['metadata']['_count']
-                
-                _list = json_data["data"]["list"]
-                
-                for file in _list:
-                    d: dict[str, Union[int, str]] = {
-                        "fid": file["fid"],
-                        "file_name": file["file_name"],
-                        "file_type": file["file_type"],
-                        "dir": file["dir"],
-                        "pdir_fid": file["pdir_fid"],
-                        "include_items": file.get("include_items", ''),
-                        "share_fid_token": file["share_fid_token"],
-                        "status": file["status"]
-                    }
-                    file_list.append(d)
-                if _total <= _size or _count < _size:
-                    return is_owner, file_list
-                
-                page += 1
+        # 本次调用内不变的参数只构建一次，每页只补充页码
+        base_params = {**_DETAIL_BASE_PARAMS, "pwd_id": pwd_id, "stoken": stoken, 'pdir_fid': pdir_fid}
+        
+        async def _fetch_page(page: int) -> dict:
+            return await self._get(api, {**base_params, "_page": str(page)})
+        
+        def _project(_list: list) -> list[ShareFile]:
+            # 每页到达后立即只保留需要的字段，完整的响应数据（缩略图等）随即可被回收
+            return [
+                ShareFile(f["fid"], f["file_name"], f["file_type"], f["dir"], f["pdir_fid"],
+                          f.get("include_items", ''), f["share_fid_token"], f["status"])
+                for f in _list
+            ]
+        
+        json_data = await _fetch_page(1)
+        is_owner = json_data['data']['is_owner']
+        _total = json_data['metadata']['_total']
+        if _total < 1:
+            return is_owner, []
+        
+        _size = json_data['metadata']['_size']
+        _count = json_data['metadata']['_count']
+        file_list: list[ShareFile] = _project(json_data["data"]["list"])
+        del json_data
+        
+        if _total > _size and _count >= _size:
+            # 剩余分页并发请求，用信号量限制同时在途的请求数
+            semaphore = asyncio.Semaphore(self.DETAIL_CONCURRENCY)
+            
+            async def _bounded(page: int) -> list[ShareFile]:
+                async with semaphore:
+                    return _project((await _fetch_page(page))["data"]["list"])
+            
+            pages_needed = (_total + _size - 1) // _size
+            for page_files in await asyncio.gather(*[_bounded(p) for p in range(2, pages_needed + 1)]):
+                file_list.extend(page_files)
+        
+        return is_owner, file_list
     
     async def get_user_info(self) -> str:
         """获取用户信息"""
@@ -181,28 +347,18 @@ class QuarkPanFileManager:
             'platform': 'pc',
         }
         
-        async with httpx.AsyncClient() as client:
-            timeout = httpx.Timeout(60.0, connect=60.0)
-            response = await client.get('https://pan.quark.cn/account/info', params=params,
-                                        headers=self.headers, timeout=timeout)
-            json_data = response.json()
-            if json_data.get('data'):
-                nickname = json_data['data'].get('nickname', '未知用户')
-                return nickname
-            else:
-                return ""
-    
+        response = await self._client.get('https://pan.quark.cn/account/info', params=params)
+        json_data = _loads(response)
+        if json_data.get('data'):
+            nickname = json_data['data'].get('nickname', '未知用户')
+            return nickname
+        else:
+            return ""
+
     async def get_share_save_task_id(self, pwd_id: str, stoken: str, first_ids: list[str], 
                                      share_fid_tokens: list[str], to_pdir_fid: str = '0') -> str:
         """获取转存任务ID"""
         task_url = "https://drive.quark.cn/1/clouddrive/share/sharepage/save"
-        params = {
-            "pr": "ucpro",
-            "fr": "pc",
-            "uc_param_str": "",
-            "__dt": random.randint(600, 9999),
-            "__t": get_timestamp(13),
-        }
         data = {
             "fid_list": first_ids,
             "fid_token_list": share_fid_tokens,
@@ -213,27 +369,22 @@ class QuarkPanFileManager:
             "scene": "link"
         }
         
-        async with httpx.AsyncClient() as client:
-            timeout = httpx.Timeout(60.0, connect=60.0)
-            response = await client.post(task_url, json=data, headers=self.headers, params=params, timeout=timeout)
-            json_data = response.json()
-            task_id = json_data['data']['task_id']
-            custom_print(f'获取任务ID：{task_id}')
-            return task_id
-    
-    async def submit_task(self, task_id: str, retry: int = 50) -> dict:
-        """提交转存任务"""
+        json_data = await self._post(task_url, data)
+        task_id = json_data['data']['task_id']
+        custom_print(f'获取任务ID：{task_id}')
+        return task_id
+
+    async def submit_task(self, task_id: str, retry: int = 50, timeout: float = 60.0) -> dict:
+        """提交转存任务（指数退避轮询，最多retry次或timeout秒）"""
+        deadline = time.monotonic() + timeout
         for i in range(retry):
-            await asyncio.sleep(random.randint(500, 1000) / 1000)
+            await asyncio.sleep(_backoff_delay(i))
+            if time.monotonic() > deadline:
+                break
             custom_print(f'第{i + 1}次提交任务')
-            submit_url = (f"https://drive-pc.quark.cn/1/clouddrive/task?pr=ucpro&fr=pc&uc_param_str=&task_id={task_id}"
-                          f"&retry_index={i}&__dt=21192&__t={get_timestamp(13)}")
-            
-            async with httpx.AsyncClient() as client:
-                timeout = httpx.Timeout(60.0, connect=60.0)
-                response = await client.get(submit_url, headers=self.headers, timeout=timeout)
-                json_data = response.json()
-            
+            json_data = await self._get('https://drive-pc.quark.cn/1/clouddrive/task',
+                                        {'task_id': task_id, 'retry_index': i})
+        
             if json_data['message'] == 'ok':
                 if json_data['data']['status'] == 2:
                     if 'to_pdir_name' in json_data['data']['save_as']:
@@ -257,35 +408,6 @@ class QuarkPanFileManager:
         
         raise Exception("转存任务超时")
     
-    async def delete_files(self, fid_list: list[str]) -> bool:
-        """删除指定文件/文件夹"""
-        if not fid_list:
-            return True
-        try:
-            params = {
-                'pr': 'ucpro',
-                'fr': 'pc',
-                'uc_param_str': '',
-            }
-            json_data = {
-                'action_type': 2,
-                'exclude_fids': [],
-                'filelist': fid_list,
-            }
-            async with httpx.AsyncClient() as client:
-                timeout = httpx.Timeout(60.0, connect=60.0)
-                response = await client.post('https://drive-pc.quark.cn/1/clouddrive/file/delete',
-                                             params=params, json=json_data, headers=self.headers, timeout=timeout)
-                json_data = response.json()
-                if json_data.get('code') == 0:
-                    custom_print(f"已删除 {len(fid_list)} 个文件/文件夹")
-                    return True
-                custom_print(f"删除文件失败: {json_data.get('message', '未知错误')}", error_msg=True)
-                return False
-        except Exception as e:
-            custom_print(f"删除文件异常: {str(e)}", error_msg=True)
-            return False
-    
     async def _filter_banned_files(self, folder_id: str) -> dict:
         """
         根据关键词递归删除转存目录中的广告文件/文件夹
@@ -295,42 +417,58 @@ class QuarkPanFileManager:
         """
         if not self.banned_keywords:
             return {"scanned": 0, "matched": 0, "deleted": 0, "all_deleted": False}
-        stack = [folder_id]
         total_scanned = 0
         total_matched = 0
         delete_fids: List[str] = []
+        deleted_count = 0
+        delete_tasks: List[asyncio.Task] = []
+        semaphore = asyncio.Semaphore(self.LIST_CONCURRENCY)
+        banned_search = self._banned_re.search
+        
+        async def _list(fid: str) -> dict:
+            async with semaphore:
+                return await self.get_sorted_file_list(
+                    pdir_fid=fid, page='1', size='200',
+                    fetch_total='false', sort='file_type:asc,updated_at:desc'
+                )
         
-        while stack:
-            current = stack.pop()
-            file_list_data = await self.get_sorted_file_list(
-                pdir_fid=current, page='1', size='200',
-                fetch_total='false', sort='file_type:asc,updated_at:desc'
-            )
-            if file_list_data.get('code') != 0:
-                continue
-            items = file_list_data.get('data', {}).get('list', []) or []
-            total_scanned += len(items)
-            
-            for item in items:
-                name = item.get('file_name', '')
-                fid = item.get('fid')
-                is_dir = item.get('dir') or item.get('file_type') == 0
-                
-                matched = any(k.lower() in name.lower() for k in self.banned_keywords)
-                if matched and fid:
-                    delete_fids.append(fid)
-                    total_matched += 1
+        # 按层遍历：同一层的目录并发列出，总耗时与目录深度而不是目录数量成正比
+        current_level = [folder_id]
+        while current_level:
+            next_level: List[str] = []
+            results = await asyncio.gather(*[_list(fid) for fid in current_level])
+            for file_list_data in results:
+                if file_list_data.get('code') != 0:
                     continue
+                items = file_list_data.get('data', {}).get('list', []) or []
+                total_scanned += len(items)
                 
-                # 目录未命中则继续深入
-                if is_dir and fid:
-                    stack.append(fid)
+                for item in items:
+                    name = item.get('file_name', '')
+                    fid = item.get('fid')
+                    is_dir = item.get('dir') or item.get('file_type') == 0
+                    
+                    if fid and banned_search(name):
+                        delete_fids.append(fid)
+                        total_matched += 1
+                        continue
+                    
+                    # 目录未命中则继续深入
+                    if is_dir and fid:
+                        next_level.append(fid)
+            # 命中数量攒够一批就先提交删除，与下一层目录的列出重叠进行
+            if len(delete_fids) >= self.DELETE_CHUNK:
+                delete_tasks.append(asyncio.create_task(self.delete_files(delete_fids, self.DELETE_CHUNK)))
+                deleted_count += len(delete_fids)
+                delete_fids = []
+            current_level = next_level
         
         custom_print(f"[广告过滤] 扫描 {total_scanned} 个文件/文件夹，匹配屏蔽词 {total_matched} 个")
-        deleted_count = 0
         if delete_fids:
-            await self.delete_files(delete_fids)
-            deleted_count = len(delete_fids)
+            delete_tasks.append(asyncio.create_task(self.delete_files(delete_fids, self.DELETE_CHUNK)))
+            deleted_count += len(delete_fids)
+        if delete_tasks:
+            await asyncio.gather(*delete_tasks)
         all_deleted = total_scanned > 0 and total_scanned == total_matched
         return {
             "scanned": total_scanned,
@@ -348,13 +486,12 @@ class QuarkPanFileManager:
         total_scanned = 0
         total_matched = 0
         total_deleted = 0
-        scanned_folders = []
-        for fid in list(self.recent_transfer_folders):
-            res = await self._filter_banned_files(fid)
+        scanned_folders = list(self.recent_transfer_folders)
+        results = await asyncio.gather(*[self._filter_banned_files(fid) for fid in scanned_folders])
+        for res in results:
             total_scanned += res.get("scanned", 0)
             total_matched += res.get("matched", 0)
             total_deleted += res.get("deleted", 0)
-            scanned_folders.append(fid)
         return {
             "scanned": total_scanned,
             "matched": total_matched,
@@ -373,16 +510,17 @@ class QuarkPanFileManager:
         Returns:
             dict: 转存结果信息
         """
+        # 并发转存时 self.folder_id 可能被其他任务覆盖，后续统一使用局部变量
         self.folder_id = folder_id
         share_url = share_url.strip()
         custom_print(f'文件分享链接：{share_url}')
         
         # 提取密码
-        match_password = re.search("pwd=(.*?)(?=$|&)", share_url)
+        match_password = _PWD_RE.search(share_url)
         password = match_password.group(1) if match_password else ""
         
         # 提取pwd_id
-        pwd_id = self.get_pwd_id(share_url).split("#")[0]
+        pwd_id = self.get_pwd_id(share_url)
         if not pwd_id:
             raise ValueError('文件分享链接不可为空！')
         
@@ -400,34 +538,38 @@ class QuarkPanFileManager:
         if is_owner == 1:
             raise ValueError('网盘中已经存在该文件，无需再次转存')
         
-        # 统计文件信息
-        files_count = 0
-        folders_count = 0
+        # 统计文件信息，同时收集转存任务需要的fid和share_fid_token（单次遍历）
         files_list: list[str] = []
         folders_list: list[str] = []
+        fid_list: list[str] = []
+        share_fid_token_list: list[str] = []
         
         for data in data_list:
-            if data['dir']:
-                folders_count += 1
-                folders_list.append(data["file_name"])
+            fid_list.append(data.fid)
+            share_fid_token_list.append(data.share_fid_token)
+            if data.dir:
+                folders_list.append(data.file_name)
             else:
-                files_count += 1
-                files_list.append(data["file_name"])
+                files_list.append(data.file_name)
         
+        files_count = len(files_list)
+        folders_count = len(folders_list)
         total_files_count = len(data_list)
         
         # 获取转存任务ID
-        fid_list = [i["fid"] for i in data_list]
-        share_fid_token_list = [i["share_fid_token"] for i in data_list]
         
-        if not self.folder_id:
+        if not folder_id:
             raise ValueError('保存目录ID不合法，请重新设置')
         
         task_id = await self.get_share_save_task_id(pwd_id, stoken, fid_list, share_fid_token_list,
-                                                    to_pdir_fid=self.folder_id)
+                                                    to_pdir_fid=folder_id)
         
         # 提交任务
         result = await self.submit_task(task_id)
+        self.invalidate_list_cache(folder_id)
+        # 过滤屏蔽词文件：转存完成后立即在后台开始扫描，与后续的结果整理重叠，返回前再等待完成；
+        # 未配置屏蔽词时不创建任务
+        banned_task = asyncio.create_task(self._filter_banned_files(folder_id)) if self.banned_keywords else None
         
         # 返回结果
         if 'to_pdir_name' in result['data']['save_as']:
@@ -435,15 +577,15 @@ class QuarkPanFileManager:
         else:
             folder_name = '根目录'
         
-        # 过滤屏蔽词文件
-        await self._filter_banned_files(self.folder_id)
         # 记录最近转存的文件夹
-        if self.folder_id:
-            if self.folder_id in self.recent_transfer_folders:
-                self.recent_transfer_folders.remove(self.folder_id)
-            self.recent_transfer_folders.insert(0, self.folder_id)
+        if folder_id:
+            if folder_id in self.recent_transfer_folders:
+                self.recent_transfer_folders.remove(folder_id)
+            self.recent_transfer_folders.insert(0, folder_id)
             self.recent_transfer_folders = self.recent_transfer_folders[:5]
         
+        if banned_task:
+            await banned_task
         return {
             'success': True,
             'total': total_files_count,
@@ -452,7 +594,7 @@ class QuarkPanFileManager:
             'files_list': files_list,
             'folders_list': folders_list,
             'folder_name': folder_name,
-            'folder_id': self.folder_id,  # 保存目录ID，可用于生成整个目录的分享链接
+            'folder_id': folder_id,  # 保存目录ID，可用于生成整个目录的分享链接
             'fid_list': fid_list  # 原分享链接中的fid，转存后可能需要重新获取
         }
     
@@ -468,14 +610,6 @@ class QuarkPanFileManager:
             str: 新创建的文件夹ID，失败返回None
         """
         try:
-            params = {
-                'pr': 'ucpro',
-                'fr': 'pc',
-                'uc_param_str': '',
-                '__dt': random.randint(100, 9999),
-                '__t': get_timestamp(13),
-            }
-            
             json_data = {
                 'pdir_fid': parent_folder_id,
                 'file_name': dir_name,
@@ -483,66 +617,62 @@ class QuarkPanFileManager:
                 'dir_init_lock': False,
             }
             
-            async with httpx.AsyncClient() as client:
-                timeout = httpx.Timeout(60.0, connect=60.0)
-                response = await client.post('https://drive-pc.quark.cn/1/clouddrive/file', 
-                                             params=params, json=json_data, headers=self.headers, timeout=timeout)
-                json_data = response.json()
-                
-                if json_data.get("code") == 0 and json_data.get("data"):
-                    folder_id = json_data["data"].get("fid")
-                    if folder_id:
-                        custom_print(f"创建文件夹成功: {dir_name} (ID: {folder_id})")
-                        return folder_id
-                
-                error_msg = json_data.get('message', '创建文件夹失败')
-                code = json_data.get('code', '')
-                if code == 23008:
-                    error_msg = '文件夹同名冲突，请更换一个文件夹名称后重试'
-                custom_print(f"创建文件夹失败: {error_msg}", error_msg=True)
-                return None
-                
+            json_data = await self._post('https://drive-pc.quark.cn/1/clouddrive/file', json_data)
+            
+            if json_data.get("code") == 0 and json_data.get("data"):
+                folder_id = json_data["data"].get("fid")
+                if folder_id:
+                    self.invalidate_list_cache(parent_folder_id)
+                    custom_print(f"创建文件夹成功: {dir_name} (ID: {folder_id})")
+                    return folder_id
+            
+            error_msg = json_data.get('message', '创建文件夹失败')
+            code = json_data.get('code', '')
+            if code == 23008:
+                error_msg = '文件夹同名冲突，请更换一个文件夹名称后重试'
+            custom_print(f"创建文件夹失败: {error_msg}", error_msg=True)
+            return None
+            
         except Exception as e:
             custom_print(f"创建文件夹异常: {str(e)}", error_msg=True)
             return None
 
-    async def delete_files(self, fid_list: list[str]) -> bool:
+    async def delete_files(self, fid_list: list[str], chunk: int = 200) -> bool:
         """
-        删除指定文件/文件夹
+        删除指定文件/文件夹（按chunk个一批拆分，各批并发提交）
 
         Args:
             fid_list: 要删除的fid列表
+            chunk: 每次请求删除的最大数量
 
         Returns:
-            bool: 是否删除成功
+            bool: 是否全部删除成功
         """
         if not fid_list:
             return True
-
+        chunks = [fid_list[i:i + chunk] for i in range(0, len(fid_list), chunk)]
+        results = await asyncio.gather(*[self._delete_batch(c) for c in chunks])
+        return all(results)
+    
+    async def _delete_batch(self, fid_list: list[str]) -> bool:
+        """单次请求删除一批文件/文件夹"""
         try:
-            params = {
-                "pr": "ucpro",
-                "fr": "pc",
-                "uc_param_str": ""
-            }
             json_data = {
                 "action_type": 2,
                 "exclude_fids": [],
                 "filelist": fid_list,
             }
-            async with httpx.AsyncClient() as client:
-                timeout = httpx.Timeout(60.0, connect=60.0)
-                response = await client.post(
-                    "https://drive-pc.quark.cn/1/clouddrive/file/delete",
-                    params=params, json=json_data, headers=self.headers, timeout=timeout
-                )
-                json_resp = response.json()
-                if json_resp.get("code") == 0:
-                    custom_print(f"删除文件成功: {len(fid_list)} 个")
-                    return True
-                else:
-                    custom_print(f"删除文件失败: {json_resp.get('message', '未知错误')}", error_msg=True)
-                    return False
+            # 重复删除同一批fid没有副作用，可以按幂等请求重试
+            json_resp = await self._post("https://drive-pc.quark.cn/1/clouddrive/file/delete",
+                                         json_data, idempotent=True)
+            if json_resp.get("code") == 0:
+                # 接口只给出被删除的fid，不知道其所在目录，直接清空列表缓存
+                self.invalidate_list_cache()
+                custom_print(f"删除文件成功: {len(fid_list)} 个")
+                return True
+            else:
+                custom_print(f"删除文件失败: {json_resp.get('message', '未知错误')}", error_msg=True)
+                return False
         except Exception as e:
             custom_print(f"删除文件异常: {str(e)}", error_msg=True)
             return False
@@ -566,110 +696,85 @@ class QuarkPanFileManager:
             else:
                 json_data["passcode"] = generate_random_code()
         
-        params = {
-            'pr': 'ucpro',
-            'fr': 'pc',
-            'uc_param_str': '',
-        }
+        json_data = await self._post('https://drive-pc.quark.cn/1/clouddrive/share', json_data)
         
-        async with httpx.AsyncClient() as client:
-            timeout = httpx.Timeout(60.0, connect=60.0)
-            response = await client.post('https://drive-pc.quark.cn/1/clouddrive/share', params=params,
-                                         json=json_data, headers=self.headers, timeout=timeout)
-            json_data = response.json()
-            
-            # 检查响应
-            if 'data' not in json_data:
-                error_msg = json_data.get('message', '未知错误')
-                error_code = json_data.get('code', '')
-                raise Exception(f"获取分享任务ID失败：{error_msg} (错误代码: {error_code})")
+        # 检查响应
+        if 'data' not in json_data:
+            error_msg = json_data.get('message', '未知错误')
+            error_code = json_data.get('code', '')
+            raise Exception(f"获取分享任务ID失败：{error_msg} (错误代码: {error_code})")
+        
+        if 'task_id' not in json_data['data']:
+            error_msg = json_data.get('message', '响应格式错误')
+            raise Exception(f"获取分享任务ID失败：{error_msg}")
+        
+        return json_data['data']['task_id']
+
+    async def get_share_id(self, task_id: str, timeout: float = 15.0, missing_after: float = 10.0) -> str:
+        """
+        获取分享ID（可能需要等待任务完成，指数退避轮询直到timeout秒）
+        
+        Args:
+            task_id: 分享任务ID
+            timeout: 最长等待时间（秒），超时后按最后一次响应的错误信息抛出异常
+            missing_after: 任务已完成（status为2）但仍未返回share_id时，最多再等待到的时间（秒）
+        """
+        start = time.monotonic()
+        deadline = start + timeout
+        json_data: dict = {}
+        i = 0
+        while True:
+            await asyncio.sleep(_backoff_delay(i))
+            if time.monotonic() > deadline:
+                break
+            json_data = await self._get('https://drive-pc.quark.cn/1/clouddrive/task',
+                                        {'task_id': task_id, 'retry_index': str(i)})
+            i += 1
             
-            if 'task_id' not in json_data['data']:
-                error_msg = json_data.get('message', '响应格式错误')
-                raise Exception(f"获取分享任务ID失败：{error_msg}")
+            # 响应中没有 'data' 键或返回错误时继续重试，超时后再报告最后一次的错误
+            if 'data' not in json_data or json_data.get('message') != 'ok':
+                continue
             
-            return json_data['data']['task_id']
-    
-    async def get_share_id(self, task_id: str, retry: int = 30) -> str:
-        """获取分享ID（可能需要等待任务完成）"""
-        for i in range(retry):
-            await asyncio.sleep(0.5)  # 等待0.5秒
-            params = {
-                'pr': 'ucpro',
-                'fr': 'pc',
-                'uc_param_str': '',
-                'task_id': task_id,
-                'retry_index': str(i),
-            }
-            async with httpx.AsyncClient() as client:
-                timeout = httpx.Timeout(60.0, connect=60.0)
-                response = await client.get('https://drive-pc.quark.cn/1/clouddrive/task', params=params,
-                                            headers=self.headers, timeout=timeout)
-                json_data = response.json()
-                
-                # 检查响应中是否有 'data' 键
-                if 'data' not in json_data:
-                    error_msg = json_data.get('message', '未知错误')
-                    error_code = json_data.get('code', '')
-                    if i == retry - 1:  # 最后一次重试
-                        raise Exception(f"获取分享ID失败：{error_msg} (错误代码: {error_code})")
-                    continue  # 继续重试
-                
-                # 检查响应是否成功
-                if json_data.get('message') == 'ok':
-                    data = json_data['data']
-                    # 如果已经有share_id，直接返回
-                    if 'share_id' in data:
-                        return data['share_id']
-                    # 如果任务状态不是2（处理中），继续重试
-                    status = data.get('status')
-                    if status != 2:
-                        continue
-                    # 如果状态是2但没有share_id，继续重试几次
-                    if i >= 10:  # 已经重试多次后，如果还没有share_id，可能是问题
-                        raise Exception("任务已完成但未返回share_id")
-                    continue
-                
-                # 如果返回错误，且是最后一次重试，抛出异常
-                if i == retry - 1:
-                    error_msg = json_data.get('message', '未知错误')
-                    error_code = json_data.get('code', '')
-                    raise Exception(f"获取分享ID失败：{error_msg} (错误代码: {error_code})")
-        
+            data = json_data['data']
+            # 如果已经有share_id，直接返回
+            if 'share_id' in data:
+                return data['share_id']
+            # 如果任务状态不是2（处理中），继续重试
+            if data.get('status') != 2:
+                continue
+            # 如果状态是2但没有share_id，继续等待一段时间
+            if time.monotonic() - start >= missing_after:  # 等待较久后仍没有share_id，可能是问题
+                raise Exception("任务已完成但未返回share_id")
+        
+        if json_data and json_data.get('message') != 'ok':
+            error_msg = json_data.get('message', '未知错误')
+            error_code = json_data.get('code', '')
+            raise Exception(f"获取分享ID失败：{error_msg} (错误代码: {error_code})")
         raise Exception("获取分享ID超时")
     
     async def submit_share(self, share_id: str) -> tuple:
         """提交分享并获取分享链接"""
-        params = {
-            'pr': 'ucpro',
-            'fr': 'pc',
-            'uc_param_str': '',
-        }
-        
         json_data = {
             'share_id': share_id,
         }
-        async with httpx.AsyncClient() as client:
-            timeout = httpx.Timeout(60.0, connect=60.0)
-            response = await client.post('https://drive-pc.quark.cn/1/clouddrive/share/password', params=params,
-                                         json=json_data, headers=self.headers, timeout=timeout)
-            json_data = response.json()
-            
-            # 检查响应是否成功
-            if 'data' not in json_data:
-                error_msg = json_data.get('message', '未知错误')
-                raise Exception(f"提交分享失败：{error_msg}")
-            
-            if 'share_url' not in json_data['data'] or 'title' not in json_data['data']:
-                error_msg = json_data.get('message', '响应格式错误')
-                raise Exception(f"获取分享链接失败：{error_msg}")
-            
-            share_url = json_data['data']['share_url']
-            title = json_data['data']['title']
-            if 'passcode' in json_data['data']:
-                share_url = share_url + f"?pwd={json_data['data']['passcode']}"
-            return share_url, title
-    
+        json_data = await self._post('https://drive-pc.quark.cn/1/clouddrive/share/password', json_data,
+                                     idempotent=True)
+        
+        # 检查响应是否成功
+        if 'data' not in json_data:
+            error_msg = json_data.get('message', '未知错误')
+            raise Exception(f"提交分享失败：{error_msg}")
+        
+        if 'share_url' not in json_data['data'] or 'title' not in json_data['data']:
+            error_msg = json_data.get('message', '响应格式错误')
+            raise Exception(f"获取分享链接失败：{error_msg}")
+        
+        share_url = json_data['data']['share_url']
+        title = json_data['data']['title']
+        if 'passcode' in json_data['data']:
+            share_url = share_url + f"?pwd={json_data['data']['passcode']}"
+        return share_url, title
+
     async def get_share_task_id_multi(self, fid_list: list[str], title: str, url_type: int = 1, 
                                       expired_type: int = 2, password: str = '') -> str:
         """获取分享任务ID（支持多个文件）"""
@@ -685,30 +790,20 @@ class QuarkPanFileManager:
             else:
                 json_data["passcode"] = generate_random_code()
         
-        params = {
-            'pr': 'ucpro',
-            'fr': 'pc',
-            'uc_param_str': '',
-        }
+        json_data = await self._post('https://drive-pc.quark.cn/1/clouddrive/share', json_data)
         
-        async with httpx.AsyncClient() as client:
-            timeout = httpx.Timeout(60.0, connect=60.0)
-            response = await client.post('https://drive-pc.quark.cn/1/clouddrive/share', params=params,
-                                         json=json_data, headers=self.headers, timeout=timeout)
-            json_data = response.json()
-            
-            # 检查响应
-            if 'data' not in json_data:
-                error_msg = json_data.get('message', '未知错误')
-                error_code = json_data.get('code', '')
-                raise Exception(f"获取分享任务ID失败：{error_msg} (错误代码: {error_code})")
-            
-            if 'task_id' not in json_data['data']:
-                error_msg = json_data.get('message', '响应格式错误')
-                raise Exception(f"获取分享任务ID失败：{error_msg}")
-            
-            return json_data['data']['task_id']
-    
+        # 检查响应
+        if 'data' not in json_data:
+            error_msg = json_data.get('message', '未知错误')
+            error_code = json_data.get('code', '')
+            raise Exception(f"获取分享任务ID失败：{error_msg} (错误代码: {error_code})")
+        
+        if 'task_id' not in json_data['data']:
+            error_msg = json_data.get('message', '响应格式错误')
+            raise Exception(f"获取分享任务ID失败：{error_msg}")
+        
+        return json_data['data']['task_id']
+
     async def create_share_link(self, fid: str, file_name: str, expired_type: int = 4, 
                                 password: str = '', ad_fid: str = '') -> tuple:
         """
@@ -758,29 +853,56 @@ class QuarkPanFileManager:
         return share_url, share_title
     
     async def get_sorted_file_list(self, pdir_fid='0', page='1', size='100', 
-                                   fetch_total='false', sort='') -> dict[str, Any]:
-        """获取文件列表"""
+                                   fetch_total='false', sort='', use_cache: bool = True,
+                                   max_age: Optional[float] = None) -> dict[str, Any]:
+        """
+        获取文件列表（对同一文件夹同一页的重复查询直接返回缓存）
+        
+        转存、创建文件夹、删除文件后相关缓存会被清除。缓存的响应数据由各调用方共用，调用方不应修改。
+        
+        Args:
+            use_cache: 是否使用缓存
+            max_age: 可接受的缓存时间（秒），默认LIST_CACHE_TTL，最长LIST_CACHE_MAX_AGE
+        """
+        key = (pdir_fid, page, size, sort, fetch_total)
+        now = time.monotonic()
+        if use_cache:
+            cached = self._list_cache.get(key)
+            max_age = self.LIST_CACHE_TTL if max_age is None else min(max_age, self.LIST_CACHE_MAX_AGE)
+            if cached and now - cached[0] < max_age:
+                return cached[1]
+        epoch = self._list_cache_epoch
+        
         params = {
-            'pr': 'ucpro',
-            'fr': 'pc',
-            'uc_param_str': '',
             'pdir_fid': pdir_fid,
             '_page': page,
             '_size': size,
             '_fetch_total': fetch_total,
             '_fetch_sub_dirs': '1',
             '_sort': sort,
-            '__dt': random.randint(100, 9999),
-            '__t': get_timestamp(13),
         }
         
-        async with httpx.AsyncClient() as client:
-            timeout = httpx.Timeout(60.0, connect=60.0)
-            response = await client.get('https://drive-pc.quark.cn/1/clouddrive/file/sort', params=params,
-                                        headers=self.headers, timeout=timeout)
-            json_data = response.json()
-            return json_data
+        json_data = await self._get('https://drive-pc.quark.cn/1/clouddrive/file/sort', params)
+        # 请求期间缓存被清除过（如并发的转存/删除）时，结果可能是变化前的列表，不写入缓存
+        if json_data.get('code') == 0 and epoch == self._list_cache_epoch:
+            # 顺带清理超过最长保留时间的缓存，并按写入顺序淘汰超出数量上限的条目，避免无限增长
+            for k in [k for k, (cached_at, _) in self._list_cache.items() if now - cached_at >= self.LIST_CACHE_MAX_AGE]:
+                del self._list_cache[k]
+            self._list_cache.pop(key, None)
+            self._list_cache[key] = (now, json_data)
+            while len(self._list_cache) > self.LIST_CACHE_SIZE:
+                del self._list_cache[next(iter(self._list_cache))]
+        return json_data
     
+    def invalidate_list_cache(self, pdir_fid: Optional[str] = None) -> None:
+        """文件夹内容变化后清除其列表缓存，pdir_fid为None时清空全部"""
+        self._list_cache_epoch += 1
+        if pdir_fid is None:
+            self._list_cache.clear()
+            return
+        for k in [k for k in self._list_cache if k[0] == pdir_fid]:
+            del self._list_cache[k]
+
     async def load_folder_id(self, renew=False) -> tuple:
         """加载文件夹ID"""
         self.user = await self.get_user_info()
@@ -789,7 +911,7 @@ class QuarkPanFileManager:
         
         # 从配置文件读取保存目录
         try:
-            json_data = read_config(f'{CONFIG_DIR}/config.json', 'json')
+            json_data = _read_json_config(f'{CONFIG_DIR}/config.json')
             if json_data:
                 self.pdir_id = json_data.get('pdir_id', '0')
                 self.dir_name = json_data.get('dir_name', '根目录')
@@ -9,9 +9,20 @@ from typing import Union
 from colorama import Fore, Style
 
 
-def get_datetime(timestamp: Union[int, float, None] = None, fmt: str = "%Y-%m-%d %H:%M:%S") -> str:
+_DEFAULT_DATETIME_FMT = "%Y-%m-%d %H:%M:%S"
+# 默认格式的当前时间文本按秒缓存：(秒级时间戳, 时间文本)
+_now_text_cache = (0, "")
+
+
+def get_datetime(timestamp: Union[int, float, None] = None, fmt: str = _DEFAULT_DATETIME_FMT) -> str:
+    global _now_text_cache
     if timestamp is None or not isinstance(timestamp, (int, float)):
-        return datetime.today().strftime(fmt)
+        if fmt != _DEFAULT_DATETIME_FMT:
+            return datetime.today().strftime(fmt)
+        now = int(time.time())
+        if now != _now_text_cache[0]:
+            _now_text_cache = (now, datetime.fromtimestamp(now).strftime(fmt))
+        return _now_text_cache[1]
     else:
         dt = datetime.fromtimestamp(timestamp)
         formatted_time = dt.strftime(fmt)
@@ -3,36 +3,103 @@
 支持企业微信应用的消息发送（通过AccessToken）
 注意：消息加密功能需要pycryptodome库，如果不需要接收加密消息可以省略
 """
+import asyncio
+import hashlib
 import json
+import os
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 import httpx
-from typing import Optional
+from typing import NamedTuple, Optional
 from utils import get_datetime
 
+# 尝试导入h2以启用HTTP/2（httpx[http2]，并发发送的消息复用同一连接；未安装时使用HTTP/1.1）
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
 
-def adapt_request_url(base_url: str, path: str) -> str:
-    """
-    适配请求URL（用于代理支持）
-    
-    Args:
-        base_url: 基础URL（如：https://qyapi.weixin.qq.com 或代理地址）
-        path: 相对路径（如：cgi-bin/gettoken?corpid={corpid}&corpsecret={corpsecret}）
-    
-    Returns:
-        完整的URL
-    """
-    # 移除base_url末尾的斜杠
-    base_url = base_url.rstrip('/')
-    # 确保path以/开头
-    if not path.startswith('/'):
-        path = '/' + path
-    return base_url + path
+# 尝试导入orjson用于请求体序列化和响应解析（C实现，比标准库json更快；未安装时回退到标准库json）
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# 尝试导入fcntl用于多进程共用token缓存文件时加文件锁（仅POSIX；Windows等平台不加锁，仍可正常使用缓存）
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+# 尝试导入msgspec用于把接口响应直接解码为WxResp（跳过中间dict；未安装时用orjson/json解析后再构造WxResp）
+try:
+    import msgspec
+    MSGSPEC_AVAILABLE = True
+except ImportError:
+    MSGSPEC_AVAILABLE = False
+
+_JSON_HEADERS = {'Content-Type': 'application/json'}
+
+
+def _dumps(data) -> bytes:
+    """序列化请求体为UTF-8编码的JSON字节串"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+
+def _loads(content: bytes) -> dict:
+    """解析JSON字节串（接口响应体或本地token缓存文件）"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+if MSGSPEC_AVAILABLE:
+    class WxResp(msgspec.Struct):
+        """企业微信接口返回结果（只解码用到的字段）"""
+        errcode: int = -1
+        errmsg: str = ""
+        access_token: str = ""
+        expires_in: int = 7200
+
+    _resp_decoder = msgspec.json.Decoder(WxResp)
+
+    def _decode_resp(content: bytes) -> WxResp:
+        """解析接口返回的JSON响应体"""
+        return _resp_decoder.decode(content)
+else:
+    class WxResp(NamedTuple):
+        """企业微信接口返回结果（只解码用到的字段）"""
+        errcode: int = -1
+        errmsg: str = ""
+        access_token: str = ""
+        expires_in: int = 7200
+
+    def _decode_resp(content: bytes) -> WxResp:
+        """解析接口返回的JSON响应体"""
+        result = _loads(content)
+        return WxResp(
+            errcode=result.get('errcode', -1),
+            errmsg=result.get('errmsg', ''),
+            access_token=result.get('access_token', ''),
+            expires_in=result.get('expires_in', 7200),
+        )
 
 
 class WeChatApp:
     """企业微信应用类（使用AccessToken发送消息）"""
     
-    def __init__(self, corp_id: str, agent_id: str, secret: str, proxy: Optional[str] = None):
+    # 后台刷新AccessToken：gettoken返回的仍是旧token时的重试间隔（秒），以及刷新失败后的重试间隔（秒）
+    TOKEN_RENEW_POLL = 1.0
+    TOKEN_REFRESH_RETRY = 60
+    
+    def __init__(self, corp_id: str, agent_id: str, secret: str, proxy: Optional[str] = None,
+                 token_cache_path: Optional[str] = None):
         """
         初始化企业微信应用
         
@@ -43,24 +110,76 @@ class WeChatApp:
             proxy: 代理服务器地址（可选，默认：https://qyapi.weixin.qq.com）
                    2022年6月20日后创建的自建应用才需要配置代理
                    不使用代理时需要保留默认值'https://qyapi.weixin.qq.com'
+            token_cache_path: AccessToken缓存文件路径（可选），进程重启后复用仍在有效期内的token
         """
         self.corp_id = corp_id
         self.agent_id = agent_id
         self.secret = secret
         self._access_token = None
         self._token_expires_at = 0
+        # 获取token时的锁（并发发送时只有一个协程/线程请求gettoken），以及后台刷新任务
+        self._token_lock = asyncio.Lock()
+        self._token_sync_lock = threading.Lock()
+        self._token_refresher_task: Optional[asyncio.Task] = None
         # 设置代理地址，默认为企业微信官方API地址
         self._proxy = proxy or "https://qyapi.weixin.qq.com"
         
-        # 构建API URL（使用代理适配）
-        self._token_url = adapt_request_url(self._proxy, "cgi-bin/gettoken")
-        self._send_msg_url = adapt_request_url(self._proxy, "cgi-bin/message/send")
-        self._create_menu_url = adapt_request_url(self._proxy, "cgi-bin/menu/create")
-        self._delete_menu_url = adapt_request_url(self._proxy, "cgi-bin/menu/delete")
+        # 所有接口共用长连接客户端（base_url为代理地址，各接口使用相对路径），
+        # 避免每次请求都重新与qyapi.weixin.qq.com建立TCP/TLS连接。
+        # 消息发送走异步客户端，不阻塞事件循环，多条消息可以并发发送；同步客户端用于菜单等同步调用。
+        # 连接失败时由transport自动重试（指定transport后连接池参数和http2需要设置在transport上）
+        base_url = self._proxy.rstrip('/') + '/'
+        self._client = httpx.Client(
+            base_url=base_url,
+            timeout=10.0,
+            transport=httpx.HTTPTransport(
+                http2=HTTP2_AVAILABLE,
+                limits=httpx.Limits(max_keepalive_connections=10, max_connections=20),
+                retries=2,
+            ),
+        )
+        self._aclient = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=10.0,
+            transport=httpx.AsyncHTTPTransport(
+                http2=HTTP2_AVAILABLE,
+                limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+                retries=2,
+            ),
+        )
+        
+        # API相对路径
+        self._token_url = "cgi-bin/gettoken"
+        self._send_msg_url = "cgi-bin/message/send"
+        self._create_menu_url = "cgi-bin/menu/create"
+        self._delete_menu_url = "cgi-bin/menu/delete"
+        self._token_params = {
+            'corpid': self.corp_id,
+            'corpsecret': self.secret
+        }
+        
+        # 从缓存文件恢复上次的token（重启后首条消息无需先请求gettoken）
+        self._token_cache_path = token_cache_path
+        self._secret_digest = hashlib.sha256(secret.encode('utf-8')).hexdigest()[:16]
+        self._load_token_cache()
+    
+    def close(self) -> None:
+        """关闭同步HTTP客户端"""
+        self._client.close()
+    
+    async def aclose(self) -> None:
+        """关闭异步HTTP客户端"""
+        await self._aclient.aclose()
+    
+    def __enter__(self) -> 'WeChatApp':
+        return self
+    
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
     
     def get_access_token(self, force_refresh: bool = False) -> str:
         """
-        获取AccessToken（会自动缓存和刷新）
+        获取AccessToken（会自动缓存和刷新，同步版本，供菜单等同步调用方使用）
         
         Args:
             force_refresh: 是否强制刷新
@@ -72,81 +191,329 @@ class WeChatApp:
         if not force_refresh and self._access_token and time.time() < self._token_expires_at:
             return self._access_token
         
-        try:
-            url = self._token_url
-            params = {
-                'corpid': self.corp_id,
-                'corpsecret': self.secret
-            }
-            
-            with httpx.Client(timeout=10.0) as client:
-                response = client.get(url, params=params)
-                result = response.json()
-                
-                if result.get("errcode") == 0:
-                    self._access_token = result.get("access_token")
-                    # Token有效期通常是7200秒，提前5分钟刷新
-                    expires_in = result.get("expires_in", 7200)
-                    self._token_expires_at = time.time() + expires_in - 300
+        with self._token_sync_lock:
+            # 等待锁期间其他线程可能已经刷新了token
+            if not force_refresh and self._access_token and time.time() < self._token_expires_at:
+                return self._access_token
+            # 持有文件锁期间只有一个进程请求gettoken，其余进程等锁后直接读取缓存文件
+            lock_fd = self._lock_token_file()
+            try:
+                # 其他进程可能已经刷新并写入了缓存文件
+                if self._load_token_cache(newer_than=self._token_expires_at if force_refresh else 0):
                     return self._access_token
-                else:
-                    error_msg = result.get('errmsg', '未知错误')
-                    raise Exception(f"获取AccessToken失败: {error_msg} (错误码: {result.get('errcode')})")
+                try:
+                    response = self._client.get(self._token_url, params=self._token_params)
+                    access_token = self._store_token(_decode_resp(response.content))
+                except Exception as e:
+                    raise Exception(f"获取AccessToken异常: {str(e)}")
+                self._save_token_cache()
+                return access_token
+            finally:
+                self._unlock_token_file(lock_fd)
+    
+    async def get_access_token_async(self, force_refresh: bool = False) -> str:
+        """
+        获取AccessToken（异步版本，刷新时不阻塞事件循环）
+        
+        Args:
+            force_refresh: 是否强制刷新
+        
+        Returns:
+            AccessToken字符串
+        """
+        if not force_refresh and self._access_token and time.time() < self._token_expires_at:
+            self._ensure_token_refresher()
+            return self._access_token
+        
+        async with self._token_lock:
+            # 等待锁期间其他协程可能已经刷新了token
+            if not force_refresh and self._access_token and time.time() < self._token_expires_at:
+                return self._access_token
+            if not self._token_cache_path:
+                access_token = await self._fetch_token_async()
+            else:
+                # 文件锁和缓存文件读写都是阻塞调用，放到线程池中执行，不阻塞事件循环
+                loop = asyncio.get_running_loop()
+                lock_fd = await loop.run_in_executor(None, self._lock_token_file)
+                try:
+                    newer_than = self._token_expires_at if force_refresh else 0
+                    if await loop.run_in_executor(None, self._load_token_cache, newer_than):
+                        access_token = self._access_token
+                    else:
+                        access_token = await self._fetch_token_async()
+                        await loop.run_in_executor(None, self._save_token_cache)
+                finally:
+                    self._unlock_token_file(lock_fd)
+        self._ensure_token_refresher()
+        return access_token
+    
+    async def _fetch_token_async(self) -> str:
+        """请求gettoken接口并保存到内存"""
+        try:
+            response = await self._aclient.get(self._token_url, params=self._token_params)
+            return self._store_token(_decode_resp(response.content))
         except Exception as e:
             raise Exception(f"获取AccessToken异常: {str(e)}")
     
-    def send_text_message(self, content: str, touser: Optional[str] = None,
-                         toparty: Optional[str] = None, totag: Optional[str] = None,
-                         safe: int = 0) -> bool:
+    def _ensure_token_refresher(self) -> None:
+        """首次在事件循环中使用时启动后台刷新任务"""
+        if self._token_refresher_task is None or self._token_refresher_task.done():
+            self._token_refresher_task = asyncio.get_running_loop().create_task(self._token_refresher())
+    
+    async def _token_refresher(self) -> None:
         """
-        发送文本消息
+        后台刷新AccessToken
+        
+        企业微信在token有效期内重复调用gettoken只会返回同一个token（expires_in为剩余时间），提前刷新拿不到新token，
+        因此在token到期时刷新一次。刷新期间持有_token_lock，发送消息的协程等待这一次刷新的结果，不会各自请求gettoken；
+        返回的仍是旧token（本地时钟略快）时，_token_expires_at已按剩余时间更新，短暂等待后重试
+        """
+        while True:
+            await asyncio.sleep(max(self._token_expires_at - time.time(), self.TOKEN_RENEW_POLL))
+            old_token = self._access_token
+            try:
+                await self.get_access_token_async(force_refresh=True)
+            except Exception as e:
+                print(f"后台刷新AccessToken失败: {str(e)}")
+                await asyncio.sleep(self.TOKEN_REFRESH_RETRY)
+                continue
+            if self._access_token == old_token:
+                print("后台刷新AccessToken：token尚未到期，稍后重试")
+    
+    def _store_token(self, result: WxResp) -> str:
+        """保存gettoken接口返回的AccessToken"""
+        if result.errcode == 0:
+            self._access_token = result.access_token
+            self._cache_token_urls()
+            # 记录真实的过期时间（有效期通常是7200秒，由后台任务在到期时刷新）
+            self._token_expires_at = time.time() + result.expires_in
+            return self._access_token
+        else:
+            error_msg = result.errmsg or '未知错误'
+            raise Exception(f"获取AccessToken失败: {error_msg} (错误码: {result.errcode})")
+    
+    def _load_token_cache(self, newer_than: float = 0) -> bool:
+        """
+        从缓存文件加载AccessToken
         
         Args:
-            content: 消息内容
-            touser: 用户ID列表，多个用|分隔，@all表示所有成员
-            toparty: 部门ID列表，多个用|分隔
-            totag: 标签ID列表，多个用|分隔
-            safe: 是否保密消息，0表示可对外分享，1表示不能分享且内容显示水印
+            newer_than: 只接受过期时间晚于该值的缓存（强制刷新时传入当前token的过期时间，
+                        只有其他进程已经刷新过才直接使用）
         
         Returns:
-            是否发送成功
+            缓存属于当前应用且未过期时返回True（已写入_access_token），否则返回False
+        """
+        if not self._token_cache_path:
+            return False
+        try:
+            with open(self._token_cache_path, 'rb') as f:
+                cache = _loads(f.read())
+        except (OSError, ValueError):
+            return False
+        # 企业ID/应用ID/密钥变更后旧token不能再用
+        if (cache.get('corp_id') != self.corp_id or str(cache.get('agent_id')) != str(self.agent_id)
+                or cache.get('secret') != self._secret_digest):
+            return False
+        access_token = cache.get('access_token')
+        expires_at = cache.get('expires_at', 0)
+        if not access_token or expires_at <= max(time.time(), newer_than):
+            return False
+        self._access_token = access_token
+        self._token_expires_at = expires_at
+        self._cache_token_urls()
+        return True
+    
+    def _save_token_cache(self) -> None:
+        """将AccessToken写入缓存文件（先写临时文件再os.replace，读取方不会读到半个文件）"""
+        if not self._token_cache_path:
+            return
+        cache = {
+            'corp_id': self.corp_id,
+            'agent_id': self.agent_id,
+            'secret': self._secret_digest,
+            'access_token': self._access_token,
+            'expires_at': self._token_expires_at,
+        }
+        tmp_path = f"{self._token_cache_path}.{os.getpid()}.tmp"
+        try:
+            # token是明文凭据，文件只允许当前用户读写
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(_dumps(cache))
+            os.replace(tmp_path, self._token_cache_path)
+        except OSError as e:
+            print(f"保存AccessToken缓存失败: {str(e)}")
+    
+    def _lock_token_file(self) -> Optional[int]:
+        """
+        获取token缓存文件的排他锁（阻塞等待，尽力而为）
+        
+        Returns:
+            锁文件描述符；未配置缓存文件、平台不支持或加锁失败时返回None
         """
-        access_token = self.get_access_token()
+        if not self._token_cache_path or not FCNTL_AVAILABLE:
+            return None
+        try:
+            fd = os.open(f"{self._token_cache_path}.lock", os.O_RDWR | os.O_CREAT, 0o600)
+        except OSError as e:
+            print(f"打开AccessToken缓存锁文件失败: {str(e)}")
+            return None
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        except OSError as e:
+            print(f"锁定AccessToken缓存文件失败: {str(e)}")
+            os.close(fd)
+            return None
+        return fd
+    
+    @staticmethod
+    def _unlock_token_file(fd: Optional[int]) -> None:
+        """释放_lock_token_file获取的锁"""
+        if fd is not None:
+            os.close(fd)  # 关闭描述符即释放flock
+    
+    def _cache_token_urls(self) -> None:
+        """token刷新后预先拼好带access_token的接口地址，发送时直接使用"""
+        token = self._access_token
+        self._send_msg_url_with_token = f"{self._send_msg_url}?access_token={token}"
+        self._create_menu_url_with_token = f"{self._create_menu_url}?access_token={token}&agentid={self.agent_id}"
+        self._delete_menu_url_with_token = f"{self._delete_menu_url}?access_token={token}&agentid={self.agent_id}"
+    
+    async def _send_message(self, data: dict, label: str) -> bool:
+        """调用消息发送接口（异步）"""
+        await self.get_access_token_async()
         
-        url = f"{self._send_msg_url}?access_token={access_token}"
+        return await self._api_call("POST", self._send_msg_url_with_token, f"发送{label}",
+                                    content=_dumps(data), headers=_JSON_HEADERS)
+    
+    def _send_message_sync(self, data: dict, label: str) -> bool:
+        """调用消息发送接口（同步）"""
+        self.get_access_token()
         
+        return self._api_call_sync("POST", self._send_msg_url_with_token, f"发送{label}",
+                                   content=_dumps(data), headers=_JSON_HEADERS)
+    
+    async def _api_call(self, method: str, url: str, action: str, **kwargs) -> bool:
+        """
+        调用企业微信接口（异步），统一处理返回码和异常
+        
+        Args:
+            method: 请求方法
+            url: 接口相对路径（已带access_token）
+            action: 操作名称，用于日志（如"发送文本消息"、"创建菜单"）
+            **kwargs: 传给httpx请求的其他参数
+        
+        Returns:
+            errcode为0时返回True，失败或异常时打印日志并返回False
+        """
+        try:
+            response = await self._aclient.request(method, url, **kwargs)
+            return self._check_result(_decode_resp(response.content), action)
+        except Exception as e:
+            print(f"{action}异常: {str(e)}")
+            return False
+    
+    def _api_call_sync(self, method: str, url: str, action: str, **kwargs) -> bool:
+        """调用企业微信接口（同步版本，参数同_api_call）"""
+        try:
+            response = self._client.request(method, url, **kwargs)
+            return self._check_result(_decode_resp(response.content), action)
+        except Exception as e:
+            print(f"{action}异常: {str(e)}")
+            return False
+    
+    @staticmethod
+    def _check_result(result: WxResp, action: str) -> bool:
+        """检查接口的返回结果"""
+        if result.errcode == 0:
+            return True
+        else:
+            error_msg = result.errmsg or '未知错误'
+            print(f"{action}失败: {error_msg} (错误码: {result.errcode})")
+            return False
+    
+    def _build_message(self, msgtype: str, body: dict, touser: Optional[str],
+                       toparty: Optional[str], totag: Optional[str], **extra) -> dict:
+        """构建消息发送接口的请求体"""
         data = {
             "touser": touser or "@all",
-            "msgtype": "text",
+            "msgtype": msgtype,
             "agentid": self.agent_id,
-            "text": {
-                "content": content
-            },
-            "safe": safe
+            msgtype: body,
+            **extra
         }
         
         if toparty:
             data["toparty"] = toparty
         if totag:
             data["totag"] = totag
+        return data
+    
+    async def send_text_message(self, content: str, touser: Optional[str] = None,
+                                toparty: Optional[str] = None, totag: Optional[str] = None,
+                                safe: int = 0) -> bool:
+        """
+        发送文本消息
         
-        try:
-            with httpx.Client(timeout=10.0) as client:
-                response = client.post(url, json=data)
-                result = response.json()
-                
-                if result.get("errcode") == 0:
-                    return True
-                else:
-                    error_msg = result.get('errmsg', '未知错误')
-                    print(f"发送消息失败: {error_msg} (错误码: {result.get('errcode')})")
-                    return False
-        except Exception as e:
-            print(f"发送消息异常: {str(e)}")
-            return False
+        Args:
+            content: 消息内容
+            touser: 用户ID列表，多个用|分隔，@all表示所有成员
+            toparty: 部门ID列表，多个用|分隔
+            totag: 标签ID列表，多个用|分隔
+            safe: 是否保密消息，0表示可对外分享，1表示不能分享且内容显示水印
+        
+        Returns:
+            是否发送成功
+        """
+        data = self._build_message("text", {"content": content}, touser, toparty, totag, safe=safe)
+        return await self._send_message(data, "消息")
+    
+    def send_text_message_sync(self, content: str, touser: Optional[str] = None,
+                               toparty: Optional[str] = None, totag: Optional[str] = None,
+                               safe: int = 0) -> bool:
+        """发送文本消息（同步版本，参数同send_text_message）"""
+        data = self._build_message("text", {"content": content}, touser, toparty, totag, safe=safe)
+        return self._send_message_sync(data, "消息")
+    
+    async def send_text_messages_bulk(self, messages: list[tuple[str, Optional[str]]]) -> list[bool]:
+        """
+        并发发送多条文本消息
+        
+        Args:
+            messages: (消息内容, 接收用户ID) 列表，用户ID为None时发送给@all
+        
+        Returns:
+            与messages一一对应的发送结果
+        """
+        if not messages:
+            return []
+        # 先获取一次token，所有消息共用，避免并发发送时各自触发刷新
+        await self.get_access_token_async()
+        results = await asyncio.gather(
+            *[self.send_text_message(content, touser=touser) for content, touser in messages],
+            return_exceptions=True
+        )
+        return [r is True for r in results]
+    
+    def send_text_messages_bulk_sync(self, messages: list[tuple[str, Optional[str]]],
+                                     max_workers: int = 10) -> list[bool]:
+        """并发发送多条文本消息（同步版本，使用线程池和同步客户端，参数同send_text_messages_bulk）"""
+        if not messages:
+            return []
+        self.get_access_token()
+        
+        def _send(message: tuple[str, Optional[str]]) -> bool:
+            try:
+                return self.send_text_message_sync(message[0], touser=message[1])
+            except Exception as e:
+                print(f"发送消息异常: {str(e)}")
+                return False
+        
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(messages))) as pool:
+            return list(pool.map(_send, messages))
     
-    def send_markdown_message(self, content: str, touser: Optional[str] = None,
-                              toparty: Optional[str] = None, totag: Optional[str] = None) -> bool:
+    async def send_markdown_message(self, content: str, touser: Optional[str] = None,
+                                    toparty: Optional[str] = None, totag: Optional[str] = None) -> bool:
         """
         发送Markdown消息
         
@@ -159,73 +526,67 @@ class WeChatApp:
         Returns:
             是否发送成功
         """
-        access_token = self.get_access_token()
-        
-        url = f"{self._send_msg_url}?access_token={access_token}"
-        
-        data = {
-            "touser": touser or "@all",
-            "msgtype": "markdown",
-            "agentid": self.agent_id,
-            "markdown": {
-                "content": content
-            }
-        }
-        
-        if toparty:
-            data["toparty"] = toparty
-        if totag:
-            data["totag"] = totag
-        
-        try:
-            with httpx.Client(timeout=10.0) as client:
-                response = client.post(url, json=data)
-                result = response.json()
-                
-                if result.get("errcode") == 0:
-                    return True
-                else:
-                    error_msg = result.get('errmsg', '未知错误')
-                    print(f"发送Markdown消息失败: {error_msg} (错误码: {result.get('errcode')})")
-                    return False
-        except Exception as e:
-            print(f"发送Markdown消息异常: {str(e)}")
-            return False
+        data = self._build_message("markdown", {"content": content}, touser, toparty, totag)
+        return await self._send_message(data, "Markdown消息")
     
-    def send_success(self, title: str, content: str, touser: Optional[str] = None) -> bool:
-        """发送成功消息（使用text类型，支持普通微信）"""
-        text_content = f"✅ {title}\n\n"
+    def send_markdown_message_sync(self, content: str, touser: Optional[str] = None,
+                                   toparty: Optional[str] = None, totag: Optional[str] = None) -> bool:
+        """发送Markdown消息（同步版本，参数同send_markdown_message）"""
+        data = self._build_message("markdown", {"content": content}, touser, toparty, totag)
+        return self._send_message_sync(data, "Markdown消息")
+    
+    async def _send_tagged(self, icon: str, title: str, content: str, touser: Optional[str]) -> bool:
+        """发送带图标、标题和时间的通知消息（send_success/error/warning/info共用）"""
         if content:
-            text_content += f"{content}\n"
-        text_content += f"\n时间: {get_datetime()}"
-        return self.send_text_message(text_content, touser=touser)
+            parts = (f"{icon} {title}", "", content, "", f"时间: {get_datetime()}")
+        else:
+            parts = (f"{icon} {title}", "", "", f"时间: {get_datetime()}")
+        return await self.send_text_message("\n".join(parts), touser=touser)
     
-    def send_error(self, title: str, content: str, touser: Optional[str] = None) -> bool:
+    async def send_success(self, title: str, content: str, touser: Optional[str] = None) -> bool:
+        """发送成功消息（使用text类型，支持普通微信）"""
+        return await self._send_tagged("✅", title, content, touser)
+    
+    async def send_error(self, title: str, content: str, touser: Optional[str] = None) -> bool:
         """发送错误消息（使用text类型，支持普通微信）"""
-        text_content = f"❌ {title}\n\n"
-        if content:
-            text_content += f"{content}\n"
-        text_content += f"\n时间: {get_datetime()}"
-        return self.send_text_message(text_content, touser=touser)
+        return await self._send_tagged("❌", title, content, touser)
     
-    def send_warning(self, title: str, content: str, touser: Optional[str] = None) -> bool:
+    async def send_warning(self, title: str, content: str, touser: Optional[str] = None) -> bool:
         """发送警告消息（使用text类型，支持普通微信）"""
-        text_content = f"⚠️ {title}\n\n"
-        if content:
-            text_content += f"{content}\n"
-        text_content += f"\n时间: {get_datetime()}"
-        return self.send_text_message(text_content, touser=touser)
+        return await self._send_tagged("⚠️", title, content, touser)
     
-    def send_info(self, title: str, content: str, touser: Optional[str] = None) -> bool:
+    async def send_info(self, title: str, content: str, touser: Optional[str] = None) -> bool:
         """发送信息消息（使用text类型，支持普通微信）"""
-        text_content = f"ℹ️ {title}\n\n"
-        if content:
-            text_content += f"{content}\n"
-        text_content += f"\n时间: {get_datetime()}"
-        return self.send_text_message(text_content, touser=touser)
+        return await self._send_tagged("ℹ️", title, content, touser)
     
-    def send_news_message(self, articles: list, touser: Optional[str] = None,
-                          toparty: Optional[str] = None, totag: Optional[str] = None) -> bool:
+    def _news_message(self, articles: list, touser: Optional[str],
+                      toparty: Optional[str], totag: Optional[str]) -> Optional[dict]:
+        """校验并构建卡片消息请求体，没有有效文章时返回None"""
+        # 验证articles格式
+        if not articles or not isinstance(articles, list):
+            print("articles必须是包含至少一个元素的列表")
+            return None
+        
+        # 格式化articles（确保每个article都有必需字段）
+        formatted_articles = [
+            {
+                "title": article['title'],
+                "description": article.get('description', ''),
+                "picurl": article.get('picurl', ''),
+                "url": article.get('url', '')
+            }
+            for article in articles
+            if isinstance(article, dict) and 'title' in article
+        ]
+        
+        if not formatted_articles:
+            print("没有有效的文章内容")
+            return None
+        
+        return self._build_message("news", {"articles": formatted_articles}, touser, toparty, totag)
+    
+    async def send_news_message(self, articles: list, touser: Optional[str] = None,
+                                toparty: Optional[str] = None, totag: Optional[str] = None) -> bool:
         """
         发送卡片式消息（news类型）
         
@@ -242,60 +603,18 @@ class WeChatApp:
         Returns:
             是否发送成功
         """
-        access_token = self.get_access_token()
-        
-        url = f"{self._send_msg_url}?access_token={access_token}"
-        
-        # 验证articles格式
-        if not articles or not isinstance(articles, list):
-            print("articles必须是包含至少一个元素的列表")
-            return False
-        
-        # 格式化articles（确保每个article都有必需字段）
-        formatted_articles = []
-        for article in articles:
-            if not isinstance(article, dict) or 'title' not in article:
-                continue
-            formatted_article = {
-                "title": article.get('title', ''),
-                "description": article.get('description', ''),
-                "picurl": article.get('picurl', ''),
-                "url": article.get('url', '')
-            }
-            formatted_articles.append(formatted_article)
-        
-        if not formatted_articles:
-            print("没有有效的文章内容")
+        data = self._news_message(articles, touser, toparty, totag)
+        if data is None:
             return False
-        
-        data = {
-            "touser": touser or "@all",
-            "msgtype": "news",
-            "agentid": self.agent_id,
-            "news": {
-                "articles": formatted_articles
-            }
-        }
-        
-        if toparty:
-            data["toparty"] = toparty
-        if totag:
-            data["totag"] = totag
-        
-        try:
-            with httpx.Client(timeout=10.0) as client:
-                response = client.post(url, json=data)
-                result = response.json()
-                
-                if result.get("errcode") == 0:
-                    return True
-                else:
-                    error_msg = result.get('errmsg', '未知错误')
-                    print(f"发送卡片消息失败: {error_msg} (错误码: {result.get('errcode')})")
-                    return False
-        except Exception as e:
-            print(f"发送卡片消息异常: {str(e)}")
+        return await self._send_message(data, "卡片消息")
+    
+    def send_news_message_sync(self, articles: list, touser: Optional[str] = None,
+                               toparty: Optional[str] = None, totag: Optional[str] = None) -> bool:
+        """发送卡片式消息（同步版本，参数同send_news_message）"""
+        data = self._news_message(articles, touser, toparty, totag)
+        if data is None:
             return False
+        return self._send_message_sync(data, "卡片消息")
     
     def create_menu(self, buttons: list) -> bool:
         """
@@ -325,28 +644,14 @@ class WeChatApp:
         Returns:
             是否创建成功
         """
-        access_token = self.get_access_token()
-        
-        url = f"{self._create_menu_url}?access_token={access_token}&agentid={self.agent_id}"
+        self.get_access_token()
         
         data = {
             "button": buttons[:3]  # 最多3个一级菜单
         }
         
-        try:
-            with httpx.Client(timeout=10.0) as client:
-                response = client.post(url, json=data)
-                result = response.json()
-                
-                if result.get("errcode") == 0:
-                    return True
-                else:
-                    error_msg = result.get('errmsg', '未知错误')
-                    print(f"创建菜单失败: {error_msg} (错误码: {result.get('errcode')})")
-                    return False
-        except Exception as e:
-            print(f"创建菜单异常: {str(e)}")
-            return False
+        return self._api_call_sync("POST", self._create_menu_url_with_token, "创建菜单",
+                                   content=_dumps(data), headers=_JSON_HEADERS)
     
     def delete_menu(self) -> bool:
         """
@@ -355,21 +660,6 @@ class WeChatApp:
         Returns:
             是否删除成功
         """
-        access_token = self.get_access_token()
-        
-        url = f"{self._delete_menu_url}?access_token={access_token}&agentid={self.agent_id}"
+        self.get_access_token()
         
-        try:
-            with httpx.Client(timeout=10.0) as client:
-                response = client.get(url)
-                result = response.json()
-                
-                if result.get("errcode") == 0:
-                    return True
-                else:
-                    error_msg = result.get('errmsg', '未知错误')
-                    print(f"删除菜单失败: {error_msg} (错误码: {result.get('errcode')})")
-                    return False
-        except Exception as e:
-            print(f"删除菜单异常: {str(e)}")
-            return False
+        return self._api_call_sync("GET", self._delete_menu_url_with_token, "删除菜单")